@@ -0,0 +1,500 @@
+from urllib.parse import urlsplit
+import threading
+import warnings
+import asyncio
+import time
+
+import aiohttp
+
+from downloader import Download, RateLimiter
+
+# returned by a transfer when the remote file changed and its ranges were split again from the start
+RESTART = object()
+
+class AsyncDownload(Download):
+    """A Download that runs on a shared asyncio event loop instead of a dedicated thread.
+
+    Every instance is driven by the same event loop, which runs on a single background thread, so hundreds of
+    transfers can be active at once. It keeps the resume and progress semantics of `Download` and the same
+    synchronous interface, so it can be used in its place.
+
+    Attributes:
+    -----------
+    download_list : list
+        A class-level list that tracks all AsyncDownload instances.
+
+    max_concurrent : int
+        A class-level limit on how many transfers the event loop streams at the same time. Transfers over the
+        limit wait on a semaphore until a slot is free. Changes only apply before the event loop is started.
+
+    chunk_size : int
+        A class-level size, in bytes, of the chunks read from each stream.
+
+    event_driven : bool
+        A class-level flag that lets a DownloadManager start these downloads without holding a worker thread.
+    """
+
+    download_list = []
+    _progress_lines_printed = 0
+
+    max_concurrent = 100
+    chunk_size = 65536
+    event_driven = True
+
+    _loop = None
+    _loop_lock = threading.Lock()
+    _semaphore = None
+    _session = None
+
+    def __init__(self, url: str, output_file: str, headers: dict | None = None, rate_limit: float | None = None, priority: int = 0, mirrors: list[str] | None = None):
+        """Initializes an AsyncDownload instance.
+
+        The size of the file is only probed, and the journal only loaded, once the download starts, so creating
+        many instances doesn't block.
+
+        Parameters:
+        -----------
+        url : str
+            The URL of the file to be downloaded.
+
+        output_file : str
+            The file path where the downloaded content will be saved.
+
+        rate_limit : float | None, optional
+            The maximum throughput of this download in bytes per second (default is None, which disables the limit).
+
+        priority : int, optional
+            Downloads with a higher priority get the bandwidth of the class-level `rate_limiter` first (default is 0).
+
+        mirrors : list[str] | None, optional
+            Other URLs of the same file, tried in order if `url` can't be probed or fails during the download
+            (default is None).
+
+        Raises:
+        -------
+        TypeError:
+            If the `url` attribute is not of type `str`.
+
+        ValueError:
+            If another AsyncDownload object is already using the specified `output_file`.
+
+        Side Effects:
+        -------------
+        Appends the created AsyncDownload object to the class-level download_list.
+        """
+
+        if not isinstance(url, str):
+            AsyncDownload.stop_all()
+            message = f"Invalid type for 'url' attribute."
+            raise TypeError(message)
+
+        for download in AsyncDownload.download_list:
+            if download.output_file == output_file:
+                AsyncDownload.stop_all()
+                message = f"Invalid value for 'output_file' attribute. There's already a Download object using the file at '{output_file}'"
+                raise ValueError(message)
+
+        self.url = url
+        self.output_file = output_file
+        self.is_running = False
+        self._interrupt_download = False
+        self._finished = threading.Event()
+        self._finished.set()
+        self.segments = 1
+        self.priority = priority
+        self._rate_limiter = RateLimiter(rate_limit)
+        self.response = None
+        self.total_size = 0
+        self.written_bytes = 0
+        self._validators = Download._get_validators({})
+        self._ranges = []
+        self._lock = threading.Lock()
+        self._failed = False
+        self._speed = 0
+        self._speed_weight = 0
+        self._last_write = time.monotonic()
+        self._future = None
+        self._check = None
+        self._check_lock = threading.Lock()
+        self.mirrors = list(mirrors or [])
+        self._source_lock = threading.Lock()
+        self._peak_speed = 0
+        self.streaming = False
+        self._playhead = 0
+        self._readable = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._ended = False
+
+        if headers is None:
+            self._headers = {}
+
+        else:
+            self._headers = headers.copy()
+
+        AsyncDownload.download_list.append(self)
+
+    @classmethod
+    def _get_loop(cls):
+        """Gets the shared event loop, starting it on a background thread the first time it's needed.
+
+        Returns:
+        --------
+        asyncio.AbstractEventLoop
+            The event loop that drives every AsyncDownload.
+        """
+
+        with cls._loop_lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True).start()
+
+                async def setup():
+                    cls._semaphore = asyncio.Semaphore(cls.max_concurrent)
+                    connector = aiohttp.TCPConnector(limit=cls.max_concurrent)
+                    timeout = aiohttp.ClientTimeout(total=None, sock_connect=Download.timeout[0], sock_read=Download.timeout[1])
+                    cls._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+                asyncio.run_coroutine_threadsafe(setup(), loop).result()
+                cls._loop = loop
+
+            return cls._loop
+
+    @classmethod
+    def close(cls):
+        """Closes the shared session and stops the event loop.
+
+        Side Effects:
+        -------------
+        The next download that starts creates a new event loop.
+        """
+
+        with cls._loop_lock:
+            if cls._loop is None:
+                return
+
+            asyncio.run_coroutine_threadsafe(cls._session.close(), cls._loop).result()
+            cls._loop.call_soon_threadsafe(cls._loop.stop)
+            cls._loop = None
+            cls._session = None
+            cls._semaphore = None
+
+    async def _probe(self):
+        # HEAD first and a single byte range as a fallback, like 'Download._probe()'
+        async with AsyncDownload._session.head(self.url, headers=self._headers, allow_redirects=True) as response:
+            if response.status == 200 and 'Content-Length' in response.headers:
+                return int(response.headers['Content-Length']), Download._get_validators(response.headers)
+
+        headers = self._headers.copy()
+        headers.update({
+            "Range": "bytes=0-0"
+        })
+        async with AsyncDownload._session.get(self.url, headers=headers) as response:
+            if response.status not in (200, 206):
+                message = f"Unexpected status code when requesting file size: {response.status}."
+                raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status, message=message)
+
+            validators = Download._get_validators(response.headers)
+
+            if response.status == 206:
+                total_size = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+                if total_size.isdigit():
+                    return int(total_size), validators
+
+                return 0, validators
+
+            return int(response.headers.get('Content-Length', 0)), validators
+
+    async def _download_range(self, byte_range: list):
+        """Streams the remaining bytes of a range into its offset of the '.part' file.
+
+        Parameters:
+        -----------
+        byte_range : list
+            The range to download, as `[start, end, written_bytes]`.
+
+        Returns:
+        --------
+        str | object | None
+            The name of the error that broke the connection, 'IncompleteRead' if it ended before the range was
+            complete, `RESTART` if the remote file changed and every range has to be downloaded again, or None if
+            the range ended normally, the download was interrupted or can't go on.
+        """
+
+        headers, partial = self._range_headers(byte_range)
+        transfer_began = time.monotonic()
+        written_before = self.written_bytes
+        try:
+            async with AsyncDownload._session.get(self.url, headers=headers) as response:
+                # a full response to a range request means the remote file changed or can't be resumed, so the
+                # ranges are split again and the caller starts over with them
+                if response.status == 200 and partial:
+                    Download.metrics.record('restart', host=urlsplit(self.url).netloc)
+                    message = f"The remote file at '{self.url}' changed or can't be resumed, downloading it again from the start."
+                    warnings.warn(message, UserWarning)
+
+                    await asyncio.to_thread(self._discard_partial)
+                    self.total_size = response.content_length or 0
+                    self._validators = Download._get_validators(response.headers)
+                    self.segments = 1
+                    self._ranges = self._split_ranges()
+                    self.written_bytes = 0
+                    return RESTART
+
+                # server errors are retried, client errors like 403 or 404 are left to a mirror by the caller
+                elif response.status not in (200, 206):
+                    return f"HTTP {response.status}"
+
+                # reserving the space can write every block on filesystems that can't allocate it, so it's done off
+                # the event loop like the rest of the disk work
+                await asyncio.to_thread(self._create_part_file)
+                start, end, _ = byte_range
+
+                # the range only advances once the writer saves the data, so the offset read so far is kept apart
+                position = start + byte_range[2]
+                async for chunk in response.content.iter_chunked(AsyncDownload.chunk_size):
+                    # never write past the end of the range
+                    if end is not None:
+                        chunk = chunk[:end + 1 - position]
+
+                    # the per-download cap is applied before competing for the global bandwidth
+                    await self._rate_limiter.consume_async(len(chunk))
+                    await Download.rate_limiter.consume_async(len(chunk), self.priority)
+
+                    # a write only blocks while the queue is full, which must not happen on the event loop
+                    if Download.disk_writer.is_full():
+                        await asyncio.to_thread(Download.disk_writer.write, self, byte_range, chunk)
+
+                    else:
+                        Download.disk_writer.write(self, byte_range, chunk)
+
+                    position += len(chunk)
+                    self._add_written(len(chunk))
+
+                    if self._interrupt_download or end is not None and position > end:
+                        break
+
+        # a broken or stalled connection leaves the range incomplete, which is retried from where it stopped
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            self._record_transfer(transfer_began, written_before, type(error).__name__)
+            return type(error).__name__
+
+        except OSError as error:
+            self._fail_disk(error)
+            return None
+
+        finally:
+            # the range has to be up to date before it's requested again, and the file closed before it's renamed
+            try:
+                await asyncio.to_thread(Download.disk_writer.close, self)
+
+            except OSError as error:
+                self._fail_disk(error)
+
+        # a connection closed by the server without an error is still a broken one if the range isn't complete
+        error = None
+        if end is not None and not self._interrupt_download and not self._failed and not Download._range_done(byte_range):
+            error = 'IncompleteRead'
+
+        self._record_transfer(transfer_began, written_before, error)
+        return error
+
+    def _record_transfer(self, transfer_began: float, written_before: int, error: str | None = None):
+        seconds = time.monotonic() - transfer_began
+        transferred = max(self.written_bytes - written_before, 0)
+        Download.metrics.record(
+            'transfer',
+            seconds,
+            host=urlsplit(self.url).netloc,
+            bytes=transferred,
+            bytes_per_second=round(transferred / seconds) if seconds else None,
+            error=error
+        )
+
+    async def _transfer_range(self, byte_range: list):
+        """Downloads a range, reconnecting from its current offset whenever the connection breaks, stalls or ends
+        early, like `Download._transfer_range()`.
+
+        Once the source answers with a client error or fails `max_retries` times in a row, the download moves to
+        the next of its `mirrors`, and it gives up once there are none left.
+
+        Parameters:
+        -----------
+        byte_range : list
+            The range to download, as `[start, end, written_bytes]`.
+
+        Returns:
+        --------
+        object | None
+            `RESTART` if the remote file changed and the ranges were split again, otherwise None.
+        """
+
+        retries = 0
+        while not Download._range_done(byte_range):
+            written_before = byte_range[2]
+            source = self.url
+            error = await self._download_range(byte_range)
+            if error is RESTART:
+                return RESTART
+
+            if error is None or self._interrupt_download:
+                return None
+
+            # only consecutive failures count towards the limit
+            if byte_range[2] > written_before:
+                retries = 0
+
+            # client errors like 403 or 404 won't go away by retrying, but a mirror may still work
+            client_error = error.startswith('HTTP 4')
+            if client_error or retries >= Download.max_retries:
+                # probing the mirrors blocks, which only happens once a source failed
+                if await asyncio.to_thread(self._switch_source, source):
+                    retries = 0
+                    continue
+
+                if client_error:
+                    message = f"Can't download '{self.output_file}' from '{source}' ({error})."
+
+                else:
+                    message = f"Giving up on '{self.output_file}' after {retries} retries ({error})."
+
+                warnings.warn(message, RuntimeWarning)
+                self._failed = True
+                return None
+
+            retries += 1
+            Download.metrics.record('reconnect', host=urlsplit(self.url).netloc, retries=1, error=error)
+
+            # sleep in short steps so 'stop()' doesn't have to wait for the whole backoff
+            deadline = time.monotonic() + Download._backoff_delay(retries)
+            while not self._interrupt_download and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.1, deadline - time.monotonic()))
+
+            if self._interrupt_download:
+                return
+
+    async def _run(self):
+        """Probes the file size and streams the remaining bytes into the '.part' file.
+
+        Side Effects:
+        -------------
+        Waits for a free slot on the class-level semaphore before opening any connection.
+        """
+
+        async with AsyncDownload._semaphore:
+            try:
+                # the journal can only be checked against the remote file once it's probed
+                if not self._ranges:
+                    # a source that can't be probed is replaced by the next mirror
+                    while True:
+                        try:
+                            self.total_size, self._validators = await self._probe()
+                            break
+
+                        except (aiohttp.ClientError, asyncio.TimeoutError):
+                            if not self.mirrors:
+                                raise
+
+                            self.url = self.mirrors.pop(0)
+
+                    if not self.total_size:
+                        message = f"The response has no 'Content-Length' header, resuming and progress tracking will not work."
+                        warnings.warn(message, UserWarning)
+
+                    await asyncio.to_thread(self._load_journal)
+
+                # the bytes of an earlier run are checked before new ones arrive, like on 'Download._download()'
+                if Download.verify:
+                    try:
+                        await asyncio.to_thread(self._catch_up_check)
+
+                    except OSError as error:
+                        self._fail_disk(error)
+                        return
+
+                # ranges left by a segmented run are downloaded one after the other, and all over again from the
+                # new ranges if the remote file changed
+                for _ in range(3):
+                    result = None
+                    for byte_range in self._ranges:
+                        result = await self._transfer_range(byte_range)
+                        if result is RESTART or self._interrupt_download or self._failed:
+                            break
+
+                    if result is not RESTART:
+                        break
+
+                else:
+                    message = f"The server keeps sending the whole file for '{self.url}' instead of the requested ranges."
+                    warnings.warn(message, RuntimeWarning)
+                    self._failed = True
+
+                # completing reads the file back for its check and renames it
+                if self._ranges:
+                    await asyncio.to_thread(self._complete)
+
+            finally:
+                self._set_finished()
+
+    def start(self, blocking: bool = False):
+        """Schedules the download on the shared event loop.
+
+        Parameters:
+        -----------
+        blocking : bool, optional
+            If True, only returns once the download ends (default is False).
+
+        Warns:
+        ------
+        RuntimeWarning:
+            If the download is already completed or currently running.
+        """
+
+        if self.progress >= 100:
+            message = "Can't start a download that's already finished."
+            warnings.warn(message, RuntimeWarning)
+            return
+
+        if self.is_running:
+            message = "Can't start a download that's already running."
+            warnings.warn(message, RuntimeWarning)
+            return
+
+        # mark as running right away so queued downloads also count as active
+        self._set_started()
+        self._future = asyncio.run_coroutine_threadsafe(self._run(), AsyncDownload._get_loop())
+
+        if blocking:
+            self._future.result()
+
+
+def run_downloads(downloads: list[tuple[str, str]], max_concurrent: int = 100, show_progress: bool = True):
+    """Downloads every file on the list using the asyncio engine and blocks until all of them finish.
+
+    Parameters:
+    -----------
+    downloads : list[tuple[str, str]]
+        Pairs of `(url, output_file)` to be downloaded.
+
+    max_concurrent : int, optional
+        Maximum number of transfers streamed at the same time (default is 100).
+
+    show_progress : bool, optional
+        If True, prints the progress of each download (default is True).
+
+    Returns:
+    --------
+    list[AsyncDownload]
+        The created downloads.
+    """
+
+    AsyncDownload.max_concurrent = max_concurrent
+
+    download_list = []
+    for url, output_file in downloads:
+        download = AsyncDownload(url, output_file)
+        download.start()
+        download_list.append(download)
+
+    AsyncDownload.wait_downloads(show_progress)
+    AsyncDownload.close()
+    return download_list
@@ -0,0 +1,392 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+import multiprocessing
+import itertools
+import platform
+import argparse
+import tempfile
+import warnings
+import shutil
+import time
+import json
+import re
+import os
+
+# only available on unix, peak memory isn't reported on other systems
+try:
+    import resource
+
+except ImportError:
+    resource = None
+
+
+# every file served is this block repeated, so big files don't need to be kept in memory
+BLOCK = bytes(range(256)) * 4096
+WRITE_SIZE = 65536
+
+
+class BenchmarkHandler(BaseHTTPRequestHandler):
+    """Serves files of any size on '/<size>', with the behaviour of the server set by the query string.
+
+    Query parameters:
+    -----------------
+    throttle : int
+        Maximum throughput of each connection in bytes per second.
+
+    nolength : 1
+        Omits the 'Content-Length' header and closes the connection to end the body.
+
+    norange : 1
+        Ignores 'Range' headers.
+
+    disconnect : float
+        Closes the connection after sending this fraction of the response, so every range of a segmented
+        download is cut at the same point.
+
+    stall : str
+        Stops sending data for a while, as '<seconds>@<byte offset>'.
+
+    etag : str
+        The ETag of the file (default is 'bench').
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body: bool):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+        try:
+            size = int(url.path.strip('/'))
+
+        except ValueError:
+            self.send_error(404)
+            return
+
+        etag = f'"{query.get("etag", "bench")}"'
+        start, end = 0, size - 1
+        status = 200
+
+        # only honor ranges that match the current version of the file
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if range_header and not query.get('norange') and if_range in (None, etag):
+            match = re.match(r"bytes=(\d+)-(\d*)", range_header)
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+
+            status = 206
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        if not query.get('norange'):
+            self.send_header('Accept-Ranges', 'bytes')
+
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+
+        if query.get('nolength'):
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+
+        else:
+            self.send_header('Content-Length', str(end - start + 1))
+
+        self.end_headers()
+
+        if send_body:
+            self._send_body(start, end, query)
+
+    def _send_body(self, start: int, end: int, query: dict):
+        throttle = int(query.get('throttle', 0))
+        disconnect = int((end + 1 - start) * float(query.get('disconnect', 0)))
+        stall_seconds, stall_offset = 0, None
+        if query.get('stall'):
+            stall_seconds, stall_offset = query['stall'].split('@')
+            stall_seconds, stall_offset = float(stall_seconds), int(stall_offset)
+
+        began = time.monotonic()
+        sent = 0
+        position = start
+        try:
+            while position <= end:
+                if stall_offset is not None and position >= stall_offset:
+                    time.sleep(stall_seconds)
+                    stall_offset = None
+
+                offset = position % len(BLOCK)
+                chunk = BLOCK[offset:offset + min(WRITE_SIZE, end + 1 - position)]
+                if disconnect and sent + len(chunk) > disconnect:
+                    chunk = chunk[:disconnect - sent]
+
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                position += len(chunk)
+
+                if disconnect and sent >= disconnect:
+                    break
+
+                # pace the connection to the requested throughput
+                if throttle:
+                    delay = sent / throttle - (time.monotonic() - began)
+                    if delay > 0:
+                        time.sleep(delay)
+
+            self.wfile.flush()
+
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+        if disconnect or query.get('nolength'):
+            self.close_connection = True
+
+
+def serve(port_queue: multiprocessing.Queue):
+    # runs on its own process so the server's CPU time isn't counted on the results
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BenchmarkHandler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+def create_download(engine: str, url: str, output_file: str, chunk_size: int):
+    if engine == 'async':
+        from async_downloader import AsyncDownload
+        AsyncDownload.chunk_size = chunk_size or 65536
+        return AsyncDownload(url, output_file)
+
+    from downloader import Download
+    # a chunk size of 0 lets the buffers adapt to the throughput
+    Download.chunk_size = chunk_size or None
+
+    # 'segments-<n>' splits every file into n ranges
+    segments = int(engine.split('-')[1]) if engine.startswith('segments') else 1
+    return Download(url, output_file, segments=segments)
+
+def run_case(case: dict, base_url: str, result_queue: multiprocessing.Queue):
+    """Downloads `concurrency` files with the given engine and reports throughput, CPU time and peak memory.
+
+    Runs on a fresh process for every case so the peak RSS of one case doesn't leak into the next.
+    """
+
+    warnings.simplefilter("ignore")
+    output_dir = tempfile.mkdtemp(prefix="vizer-bench-")
+    url = f"{base_url}/{case["size"]}?{case["query"]}"
+
+    try:
+        # a resume case downloads the file until the server disconnects and only measures what's left
+        resumed_bytes = 0
+        if case["resume-at"]:
+            from downloader import Download
+
+            # without retries the download stops at the disconnection instead of reconnecting and finishing it
+            max_retries = Download.max_retries
+            Download.max_retries = 0
+            try:
+                interrupted = []
+                for index in range(case["concurrency"]):
+                    download = create_download(case["engine"], f"{url}&disconnect={case["resume-at"]}", f"{output_dir}/{index}.bin", case["chunk-size"])
+                    download.start(blocking=True)
+                    interrupted.append(download.written_bytes)
+
+            finally:
+                Download.max_retries = max_retries
+
+            type(download).download_list.clear()
+
+            # a file that was completed before the resume would measure nothing
+            if not all(0 < written_bytes < case["size"] for written_bytes in interrupted):
+                result_queue.put(dict(case, error="the files weren't interrupted before resuming them"))
+                return
+
+            # the asyncio engine only loads the journal once it starts, so what's resumed is counted here
+            resumed_bytes = sum(interrupted)
+
+        downloads = [create_download(case["engine"], url, f"{output_dir}/{index}.bin", case["chunk-size"]) for index in range(case["concurrency"])]
+
+        cpu_before = time.process_time()
+        began = time.perf_counter()
+
+        for download in downloads:
+            download.start()
+
+        for download in downloads:
+            download.wait()
+
+        wall_seconds = time.perf_counter() - began
+        cpu_seconds = time.process_time() - cpu_before
+
+        if case["engine"] == 'async':
+            type(downloads[0]).close()
+
+        transferred = sum(download.written_bytes for download in downloads) - resumed_bytes
+        complete = all(os.path.exists(f"{output_dir}/{index}.bin") for index in range(case["concurrency"]))
+        peak_rss_mb = None
+        if resource is not None:
+            # ru_maxrss is in kilobytes on linux and in bytes on macos
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak_rss_mb = round(peak_rss / (1000000 if platform.system() == 'Darwin' else 1000), 1)
+
+        result = dict(case)
+        result.update({
+            "complete": complete,
+            "bytes": transferred,
+            "wall-seconds": round(wall_seconds, 4),
+            "mb-per-second": round(transferred / 1000000 / wall_seconds, 2) if wall_seconds else None,
+            "cpu-seconds": round(cpu_seconds, 4),
+            "cpu-seconds-per-gb": round(cpu_seconds / (transferred / 1000000000), 3) if transferred else None,
+            "peak-rss-mb": peak_rss_mb
+        })
+        result_queue.put(result)
+
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def run_benchmarks(sizes: list[int], chunk_sizes: list[int], concurrencies: list[int], engines: list[str], query: str = "", resume_at: float | None = None, timeout: float = 600):
+    """Runs every combination of the given parameters against a local server.
+
+    Parameters:
+    -----------
+    sizes : list[int]
+        File sizes in bytes.
+
+    chunk_sizes : list[int]
+        Sizes of the chunks read from the connection, in bytes. 0 uses adaptive buffers where supported.
+
+    concurrencies : list[int]
+        Numbers of files downloaded at the same time.
+
+    engines : list[str]
+        'threads', 'segments-<n>' or 'async'.
+
+    query : str, optional
+        Query string that sets the behaviour of the server, see `BenchmarkHandler` (default is '').
+
+    resume_at : float | None, optional
+        If given, every file is first interrupted at this fraction of its size and the benchmark measures the
+        time to resume it (default is None).
+
+    timeout : float, optional
+        Maximum number of seconds for each case (default is 600).
+
+    Returns:
+    --------
+    list[dict]
+        One result per case.
+    """
+
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    server = context.Process(target=serve, args=(port_queue,), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port_queue.get()}"
+
+    results = []
+    try:
+        for size, chunk_size, concurrency, engine in itertools.product(sizes, chunk_sizes, concurrencies, engines):
+            case = {
+                "engine": engine,
+                "size": size,
+                "chunk-size": chunk_size,
+                "concurrency": concurrency,
+                "query": query,
+                "resume-at": resume_at or 0
+            }
+
+            result_queue = context.Queue()
+            process = context.Process(target=run_case, args=(case, base_url, result_queue))
+            process.start()
+            process.join(timeout)
+
+            if process.is_alive():
+                process.kill()
+                result = dict(case, error="timeout")
+
+            elif result_queue.empty():
+                result = dict(case, error=f"exit code {process.exitcode}")
+
+            else:
+                result = result_queue.get()
+
+            results.append(result)
+            print(format_result(result))
+
+    finally:
+        server.kill()
+
+    return results
+
+def format_result(result: dict):
+    name = f"{result["engine"]:>11} size={result["size"] / 1000000:g}MB chunk={result["chunk-size"]} x{result["concurrency"]}"
+    if "error" in result:
+        return f"{name}: {result["error"]}"
+
+    peak_rss = "peak RSS unavailable" if result["peak-rss-mb"] is None else f"{result["peak-rss-mb"]}MB peak RSS"
+    return f"{name}: {result["mb-per-second"]} MB/s, {result["cpu-seconds"]}s CPU, {peak_rss}"
+
+def compare(results: list[dict], baseline_path: str):
+    # matches the cases by their parameters and prints the change in throughput and CPU time
+    with open(baseline_path, 'r') as file:
+        baseline = json.load(file)["results"]
+
+    keys = ("engine", "size", "chunk-size", "concurrency", "query", "resume-at")
+    baseline = {tuple(result[key] for key in keys): result for result in baseline}
+
+    print(f"\nCompared to '{baseline_path}':")
+    for result in results:
+        previous = baseline.get(tuple(result[key] for key in keys))
+        if previous is None or "error" in result or "error" in previous:
+            continue
+
+        throughput = result["mb-per-second"] / previous["mb-per-second"] - 1
+        cpu = result["cpu-seconds"] / previous["cpu-seconds"] - 1 if previous["cpu-seconds"] else 0
+        print(f"{format_result(result).split(':')[0]}: throughput {throughput:+.1%}, CPU time {cpu:+.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmarks the download engines against a local server")
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 16, 64], help="file sizes in MB")
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[8192, 65536, 0], help="chunk sizes in bytes, 0 for adaptive buffers")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4], help="numbers of files downloaded at the same time")
+    parser.add_argument('--engines', nargs='+', default=['threads', 'segments-4', 'async'], help="'threads', 'segments-<n>' or 'async'")
+    parser.add_argument('--throttle', type=float, default=None, help="maximum speed of each connection in KB/s")
+    parser.add_argument('--no-length', action='store_true', help="don't send the 'Content-Length' header")
+    parser.add_argument('--stall', type=str, default=None, help="stall every connection, as '<seconds>@<byte offset>'")
+    parser.add_argument('--resume-at', type=float, default=None, help="interrupt the files at this fraction of their size and measure the time to resume them")
+    parser.add_argument('--timeout', type=float, default=600, help="maximum number of seconds for each case")
+    parser.add_argument('-o', '--output', type=str, default="bench_results.json", help="path to the json file where the results are saved")
+    parser.add_argument('--compare', type=str, default=None, help="path to the results of a previous run to compare against")
+
+    args = parser.parse_args()
+
+    query = []
+    if args.throttle:
+        query.append(f"throttle={int(args.throttle * 1000)}")
+
+    if args.no_length:
+        query.append("nolength=1")
+
+    if args.stall:
+        query.append(f"stall={args.stall}")
+
+    sizes = [int(size * 1000000) for size in args.sizes]
+    results = run_benchmarks(sizes, args.chunk_sizes, args.concurrency, args.engines, '&'.join(query), args.resume_at, args.timeout)
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "results": results
+        }, file, indent=2)
+
+    if args.compare:
+        compare(results, args.compare)
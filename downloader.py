@@ -1,14 +1,398 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from urllib.parse import urlsplit
+import http.client
+import itertools
+import io
 import threading
+import asyncio
+import random
 import warnings
+import heapq
+import shutil
+import queue
+import errno
 import time
+import json
+import math
+import sys
 import os
 
 import requests
+import urllib3
+
+from metrics import Metrics
+import integrity
+
+# errors raised while reading a response that only mean the connection broke
+CONNECTION_ERRORS = (requests.RequestException, urllib3.exceptions.HTTPError, http.client.HTTPException, ConnectionError, TimeoutError)
+
+# the urllib3 versions known to keep the 'http.client' response on the private '_fp' attribute
+READS_FROM_FP = int(urllib3.__version__.split('.')[0]) in (1, 2)
+
+class RateLimiter():
+    """A token bucket that limits throughput in bytes per second and serves higher priorities first.
+
+    Tokens are refilled continuously up to `burst` bytes. A caller may take tokens even if that leaves the bucket
+    in debt, which keeps large chunks from starving, and only the highest priority waiter is allowed to take
+    tokens while others are waiting.
+
+    Attributes:
+    -----------
+    rate : float | None
+        The maximum throughput in bytes per second, or None for no limit.
+    
+    burst : int
+        The maximum amount of tokens the bucket can hold.
+    """
+
+    def __init__(self, rate: float | None = None, burst: int | None = None):
+        """Initializes a RateLimiter instance.
+
+        Parameters:
+        -----------
+        rate : float | None, optional
+            The maximum throughput in bytes per second (default is None, which disables the limit).
+        
+        burst : int | None, optional
+            The maximum amount of tokens the bucket can hold (default is one second worth of tokens).
+        """
+
+        self.rate = rate
+        self.burst = burst if burst is not None else int(rate or 0)
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._counter = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def consume(self, amount: int, priority: int = 0):
+        """Blocks until `amount` bytes can be transferred without exceeding the rate.
+
+        Parameters:
+        -----------
+        amount : int
+            The number of bytes to be transferred.
+        
+        priority : int, optional
+            Callers with a higher priority get tokens first (default is 0).
+        """
+
+        if not self.rate:
+            return
+
+        with self._condition:
+            ticket = (-priority, next(self._counter))
+            heapq.heappush(self._waiting, ticket)
+
+            try:
+                while True:
+                    self._refill()
+                    if self._waiting[0] == ticket and self._tokens > 0:
+                        self._tokens -= amount
+                        return
+
+                    # the first waiter sleeps until the debt is paid, the others until they're notified
+                    if self._waiting[0] == ticket:
+                        self._condition.wait(-self._tokens / self.rate)
+
+                    else:
+                        self._condition.wait()
+
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    async def consume_async(self, amount: int, priority: int = 0):
+        """Waits until `amount` bytes can be transferred without exceeding the rate, sleeping on the event loop.
+
+        Unlike `consume()`, no thread is blocked while waiting. A coroutine doesn't hold a place among the
+        waiters, but it still gives way to waiting threads with a higher priority.
+
+        Parameters:
+        -----------
+        amount : int
+            The number of bytes to be transferred.
+
+        priority : int, optional
+            Callers with a higher priority get tokens first (default is 0).
+        """
+
+        if not self.rate:
+            return
+
+        while True:
+            # the lock is only held to compute the wait, never while sleeping
+            with self._condition:
+                self._refill()
+                if self._tokens > 0 and (not self._waiting or self._waiting[0][0] >= -priority):
+                    self._tokens -= amount
+                    return
+
+                # sleep until the debt is paid, or for about one chunk while a higher priority takes the tokens
+                delay = (-self._tokens if self._tokens <= 0 else amount) / self.rate
+
+            await asyncio.sleep(delay)
+
+class DiskWriter():
+    """Writes the data received by the downloads to their '.part' files on a thread of its own.
+
+    The connections hand their buffers over through a bounded queue and go back to reading, so a disk that
+    stalls only slows them down once the queue is full. A range only advances, and the journal is only saved,
+    after its data is on the file, so the journal never gets ahead of it.
+
+    Attributes:
+    -----------
+    queue_size : int
+        The maximum number of buffers waiting to be written.
+
+    flush_size : int
+        The number of bytes written to a file between flushes, each followed by saving the journal of the download.
+
+    fsync : str
+        When the data is forced to the disk: 'never', 'complete' to do it once a transfer ends, or 'journal'
+        to also do it before every journal save, so the journal survives a power loss.
+    """
+
+    def __init__(self, queue_size: int = 32, flush_size: int = 4 * 1024 * 1024, fsync: str = 'complete'):
+        """Initializes a DiskWriter instance. The thread is only started on the first write.
+
+        Parameters:
+        -----------
+        queue_size : int, optional
+            The maximum number of buffers waiting to be written (default is 32).
+
+        flush_size : int, optional
+            The number of bytes written to a file between flushes (default is 4 MiB).
+
+        fsync : str, optional
+            When the data is forced to the disk, one of 'never', 'complete' or 'journal' (default is 'complete').
+
+        Raises:
+        -------
+        ValueError:
+            If `fsync` is not one of the accepted policies.
+        """
+
+        if fsync not in ('never', 'complete', 'journal'):
+            message = f"Invalid value for 'fsync' attribute: '{fsync}'. Use 'never', 'complete' or 'journal'."
+            raise ValueError(message)
+
+        self.queue_size = queue_size
+        self.flush_size = flush_size
+        self.fsync = fsync
+        self._queue = queue.Queue(queue_size)
+        self._buffers = queue.SimpleQueue()
+        self._condition = threading.Condition()
+        self._thread = None
+
+        # the state of every download with an open file, keyed by the download, and the number of queued writes
+        # of every range, keyed by the download and the range
+        self._files = {}
+        self._unsaved = {}
+        self._errors = {}
+        self._pending = {}
+
+    def get_buffer(self, size: int):
+        """Gets a buffer to read into, reusing one the writer is done with if it has the same size.
+
+        Parameters:
+        -----------
+        size : int
+            The size of the buffer in bytes.
+
+        Returns:
+        --------
+        bytearray
+            The buffer.
+        """
+
+        try:
+            buffer = self._buffers.get_nowait()
+
+        except queue.Empty:
+            return bytearray(size)
+
+        if len(buffer) != size:
+            return bytearray(size)
+
+        return buffer
+
+    def is_full(self):
+        """Checks if a write would block because the queue is full."""
+
+        return self._queue.full()
+
+    def write(self, download: 'Download', byte_range: list, data: bytes | bytearray, length: int | None = None):
+        """Queues data to be written at the current end of a range, blocking while the queue is full.
+
+        Buffers created by `get_buffer()` must not be used after they're queued, since they're reused once written.
+
+        Parameters:
+        -----------
+        download : Download
+            The download the data belongs to.
+
+        byte_range : list
+            The range the data continues, as `[start, end, written_bytes]`.
+
+        data : bytes | bytearray
+            The data to be written.
+
+        length : int | None, optional
+            The number of bytes of `data` to be written (default is None, which writes all of it).
+
+        Raises:
+        -------
+        OSError:
+            If an earlier write of the download failed.
+        """
+
+        with self._condition:
+            if download in self._errors:
+                raise self._errors[download]
+
+            key = (download, id(byte_range))
+            self._pending[key] = self._pending.get(key, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+        self._queue.put((download, byte_range, data, length))
+
+    def _run(self):
+        while True:
+            download, byte_range, data, length = self._queue.get()
+            try:
+                with self._condition:
+                    failed = download in self._errors
+
+                if not failed:
+                    self._write(download, byte_range, data, length)
+
+            except OSError as error:
+                with self._condition:
+                    self._errors[download] = error
+
+            finally:
+                with self._condition:
+                    key = (download, id(byte_range))
+                    self._pending[key] -= 1
+                    if not self._pending[key]:
+                        del self._pending[key]
+
+                    self._condition.notify_all()
+
+            if isinstance(data, bytearray):
+                self._buffers.put(data)
+
+    def _write(self, download: 'Download', byte_range: list, data: bytes | bytearray, length: int | None):
+        file = self._files.get(download)
+        if file is None:
+            file = self._files[download] = open(download._part_file, 'r+b')
+            self._unsaved[download] = 0
+
+        view = memoryview(data)
+        if length is not None:
+            view = view[:length]
+
+        offset = byte_range[0] + byte_range[2]
+        file.seek(offset)
+        file.write(view)
+
+        # streamed downloads are read from the file while they run, so their data can't wait on the buffer
+        if download.streaming:
+            file.flush()
+
+        byte_range[2] += len(view)
+
+        # the data is checked while it's still in memory
+        download._check_written(offset, view)
+        download._wake_readers()
+
+        # flush the data before saving the journal so it never gets ahead of the file
+        self._unsaved[download] += len(view)
+        if self._unsaved[download] >= self.flush_size:
+            file.flush()
+            if self.fsync == 'journal':
+                os.fsync(file.fileno())
+
+            download._save_journal()
+            self._unsaved[download] = 0
+
+    def drain(self, download: 'Download', byte_range: list | None = None):
+        """Blocks until every queued write of a download, or of one of its ranges, is on its file.
+
+        Parameters:
+        -----------
+        download : Download
+            The download to wait for.
+
+        byte_range : list | None, optional
+            The range to wait for (default is None, which waits for every range).
+
+        Raises:
+        -------
+        OSError:
+            If any write of the download failed.
+        """
+
+        def is_pending():
+            return any(owner is download and (byte_range is None or range_id == id(byte_range)) for owner, range_id in self._pending)
+
+        with self._condition:
+            self._condition.wait_for(lambda: not is_pending())
+            if download in self._errors:
+                raise self._errors[download]
+
+    def close(self, download: 'Download'):
+        """Waits for the queued writes of a download, then flushes and closes its file, forcing it to the disk
+        unless `fsync` is 'never'.
+
+        Parameters:
+        -----------
+        download : Download
+            The download whose file is closed.
+
+        Raises:
+        -------
+        OSError:
+            If any write of the download failed, which is only raised once.
+        """
+
+        try:
+            self.drain(download)
+
+        finally:
+            with self._condition:
+                file = self._files.pop(download, None)
+                self._unsaved.pop(download, None)
+                self._errors.pop(download, None)
+
+            if file is not None:
+                try:
+                    file.flush()
+                    if self.fsync != 'never':
+                        os.fsync(file.fileno())
+
+                finally:
+                    file.close()
+
 
 #TODO: add option to use original file name
 class Download():
     """A class to manage the download of files, supporting resumable downloads and progress tracking.
 
+    While a download is incomplete its data is kept on a '.part' file next to the output file, along with a
+    '.part.json' journal that records the URL, the validators of the remote file (ETag and Last-Modified), its
+    total size and the progress of every byte range. The '.part' file is only renamed to the output file once
+    every byte has been written.
+
     Attributes:
     -----------
     download_list : list
@@ -26,20 +410,124 @@ class Download():
     _interrupt_download : bool
         A private attribute used to interrupt the download thread.
     
+    _finished : threading.Event
+        A private event that is set whenever the download is not running.
+    
     total_size : int
         The total size of the file to be downloaded in bytes.
     
     written_bytes : int
         The number of bytes already written to the output file.
     
-    response : requests.Response
-        The HTTP response object for the file download.
+    session : requests.Session
+        A class-level session that pools the connections used by every download.
+    
+    response : requests.Response | None
+        The HTTP response object for the file download while it's running on a single connection.
+    
+    segments : int
+        The number of parallel byte ranges used to fetch the file (1 for a single connection).
+    
+    rate_limiter : RateLimiter
+        A class-level limiter shared by every download, used to cap the total throughput.
+    
+    chunk_size : int | None
+        A class-level size, in bytes, of the buffer each connection is read into before it's written to disk. If
+        None, the size of each buffer adapts to the throughput of its connection, between `min_chunk_size` and
+        `max_chunk_size`.
+    
+    priority : int
+        The priority of this download when competing for the bandwidth of `rate_limiter`.
+
+    speed_window : float
+        A class-level time constant, in seconds, of the moving average used to estimate `speed`.
+
+    disk_writer : DiskWriter
+        A class-level writer shared by every download, which saves the data received by the connections to the
+        '.part' files on a thread of its own. Its flush and fsync policy applies to every download.
+
+    metrics : Metrics
+        A class-level collector of the transfer metrics of every download.
+
+    stall_time : float
+        A class-level number of seconds a single read can block before it's counted as a stall on the metrics.
+
+    timeout : tuple[float, float]
+        A class-level pair of connect and read timeouts in seconds. A read that blocks for longer than the read
+        timeout is treated as a broken connection.
+
+    max_retries : int
+        A class-level number of times in a row a range is requested again after its connection breaks, stalls or
+        ends early, before the download gives up.
+
+    retry_backoff : float
+        A class-level number of seconds waited before the first retry, doubled on every retry after it, up to
+        `max_backoff`.
+
+    mirrors : list[str]
+        Other URLs of the same file the download can move to, in order of preference.
+
+    collapse_window : float
+        A class-level number of seconds over which the throughput of a range is measured to notice a collapse.
+
+    collapse_ratio : float
+        A class-level fraction of the best throughput seen below which a source is considered to have collapsed,
+        and is replaced by the next mirror.
+
+    verify : bool
+        A class-level switch for the integrity check. While enabled, the data is hashed and, for MP4 files, its
+        structure checked as it's written, and the verdict is saved next to the output file once it's complete.
+        Files whose verdict is invalid are downloaded again.
+
+    event_driven : bool
+        A class-level flag for downloads whose `start()` returns right away and that set `_future` to a future
+        resolved once they end. A DownloadManager doesn't hold a worker thread or a slot for them.
+
+    streaming : bool
+        Whether the file is downloaded in playback order so it can be read while it's running, with `read_at()`
+        or `open_stream()`.
+
+    piece_size : int
+        A class-level size, in bytes, of the pieces a streaming download is split into. Every connection fetches
+        one piece at a time, the first missing one from the position last read, so the bytes a player needs next
+        always arrive first.
     """
         
     download_list = []
     _progress_lines_printed = 0
 
-    def __init__(self, url: str, output_file: str, headers: dict | None = None):
+    rate_limiter = RateLimiter()
+    speed_window = 5
+    _subscribers = []
+
+    disk_writer = DiskWriter()
+
+    metrics = Metrics()
+    stall_time = 2
+
+    timeout = (10, 30)
+    max_retries = 5
+    retry_backoff = 1
+    max_backoff = 30
+    collapse_window = 10
+    collapse_ratio = 0.1
+
+    verify = True
+
+    event_driven = False
+
+    piece_size = 16 * 1024 * 1024
+
+    chunk_size = None
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 4 * 1024 * 1024
+
+    # retry requests sent over pooled connections that the server already closed
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=32, max_retries=3))
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=32, max_retries=3))
+
+    def __init__(self, url: str, output_file: str, headers: dict | None = None, segments: int = 1, rate_limit: float | None = None, priority: int = 0, mirrors: list[str] | None = None, streaming: bool = False):
         """Initializes a Download instance.
 
         Parameters:
@@ -50,6 +538,27 @@ class Download():
         output_file : str
             The file path where the downloaded content will be saved.
         
+        segments : int, optional
+            Number of byte ranges to fetch in parallel (default is 1). Values above 1 enable the
+            segmented mode, which preallocates the '.part' file and writes every range at its own offset.
+            Each range is tracked on the journal, so every one of them can resume on its own.
+        
+        rate_limit : float | None, optional
+            The maximum throughput of this download in bytes per second (default is None, which disables the limit).
+        
+        priority : int, optional
+            Downloads with a higher priority get the bandwidth of the class-level `rate_limiter` first (default is 0).
+        
+        mirrors : list[str] | None, optional
+            Other URLs of the same file, in order of preference (default is None). The download moves to the next one
+            when `url` keeps failing or its throughput collapses, keeping the bytes already written as long as
+            the mirror reports the same size.
+        
+        streaming : bool, optional
+            If True, the file is downloaded in playback order, as pieces of `piece_size` bytes fetched by `segments`
+            connections, and every write is flushed right away so it can be read while the download runs
+            (default is False).
+        
         Raises:
         -------
         TypeError:
@@ -61,9 +570,6 @@ class Download():
         requests.RequestException:
             If the initial request to get the file size returns an unexpected status code.
         
-        requests.RequestException:
-            If the request to get the file returns an unexpected status code.
-        
         Side Effects:
         -------------
         Appends the created Download object to the class-level download_list.
@@ -84,52 +590,197 @@ class Download():
         self.output_file = output_file
         self.is_running = False
         self._interrupt_download = False
+        self._finished = threading.Event()
+        self._finished.set()
+        self.segments = segments
+        self.priority = priority
+        self._rate_limiter = RateLimiter(rate_limit)
+        self._ranges = []
+        self._lock = threading.Lock()
+        self._failed = False
+        self._speed = 0
+        self._speed_weight = 0
+        self._last_write = time.monotonic()
+        self.mirrors = list(mirrors or [])
+        self._source_lock = threading.Lock()
+        self._peak_speed = 0
+        self._check = None
+        self._check_lock = threading.Lock()
+        self.streaming = streaming
+        self._playhead = 0
+        self._readable = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._ended = False
 
         if headers is None:
             headers = {}
         
         else:
             headers = headers.copy()
-
-        # make a request to get the total size of the file
-        request_size = requests.get(url, headers=headers, stream=True)
-        if request_size.status_code not in (200, 206):
-            Download.stop_all()
-            message = f"Unexpected status code when requesting file size: {request_size.status_code}."
-            raise requests.RequestException(message)
         
-        try:
-            self.total_size = int(request_size.headers['Content-Length'])
-            request_size.close()
+        self._headers = headers
+
+        # probe the total size of the file without downloading its body
+        self.total_size, accepts_ranges, self._validators = Download._probe(url, headers)
 
-        except KeyError:
-            message = f"The response has no 'Content-Length' header, resuming and progress tracking will not work. If the output file contains some data already, it will be completely cleared when 'start()' is called."
+        if not self.total_size:
+            message = f"The response has no 'Content-Length' header, resuming and progress tracking will not work. If the output file contains some data already, it will be downloaded again from the start when 'start()' is called."
             warnings.warn(message, UserWarning)
-            self.total_size = 0
 
-        # get ammount of bytes already written before beggining
-        if os.path.exists(output_file):
-            self.written_bytes = os.path.getsize(self.output_file)
-        else:
-            self.written_bytes = 0
+        # the body is only requested when 'start()' is called
+        self.response = None
+
+        # segmented mode needs the total size to split the file into ranges
+        if self.segments > 1 and not (self.total_size and accepts_ranges):
+            message = f"The server does not support byte ranges for '{url}', falling back to a single connection."
+            warnings.warn(message, UserWarning)
+            self.segments = 1
+
+        # without ranges a streaming download is fetched in order on a single connection
+        self._accepts_ranges = bool(self.total_size and accepts_ranges)
+
+        self._load_journal()
+
+        Download.download_list.append(self)
+
+    @staticmethod
+    def _probe(url: str, headers: dict):
+        """Gets the size of a file using a HEAD request, falling back to a single byte range request.
+
+        Parameters:
+        -----------
+        url : str
+            The URL of the file.
         
-        # set range to resume download if any byte has already been written
-        if self.written_bytes:
-            headers.update({
-                "Range": f"bytes={self.written_bytes}-"
-            })
+        headers : dict
+            The headers sent with the request.
+        
+        Returns:
+        --------
+        tuple[int, bool, dict]
+            The total size of the file (0 if unknown), whether the server accepts byte ranges and the validators
+            of the file ('ETag' and 'Last-Modified').
+        
+        Raises:
+        -------
+        requests.RequestException:
+            If both requests return an unexpected status code.
+        """
 
-        if self.written_bytes == self.total_size:
-            self.response = request_size
-        else:
-            self.response = requests.get(url, headers=headers, stream=True)
+        response = Download.session.head(url, headers=headers, allow_redirects=True, timeout=Download.timeout)
+        response.close()
+        if response.status_code == 200 and 'Content-Length' in response.headers:
+            accepts_ranges = response.headers.get('Accept-Ranges') == 'bytes'
+            return int(response.headers['Content-Length']), accepts_ranges, Download._get_validators(response.headers)
+
+        # some hosts don't answer HEAD requests properly, so ask for the first byte instead
+        range_headers = headers.copy()
+        range_headers.update({
+            "Range": "bytes=0-0"
+        })
+        response = Download.session.get(url, headers=range_headers, stream=True, timeout=Download.timeout)
+        if response.status_code == 206:
+            # consume the single byte so the connection goes back to the pool
+            response.content
         
-        if self.response.status_code not in (200, 206):
-            Download.stop_all()
-            message = f"Unexpected status code: {self.response.status_code}."
-            raise requests.RequestException(message)
+        response.close()
+        if response.status_code not in (200, 206):
+            message = f"Unexpected status code when requesting file size: {response.status_code}."
+            raise requests.RequestException(message, response=response)
 
-        Download.download_list.append(self)
+        validators = Download._get_validators(response.headers)
+
+        # the total size is after the slash on 'Content-Range: bytes 0-0/<size>'
+        if response.status_code == 206:
+            total_size = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+            if total_size.isdigit():
+                return int(total_size), True, validators
+            
+            return 0, True, validators
+
+        return int(response.headers.get('Content-Length', 0)), False, validators
+
+    @staticmethod
+    def _get_validators(headers) -> dict:
+        return {
+            "etag": headers.get('ETag'),
+            "last-modified": headers.get('Last-Modified')
+        }
+
+    @staticmethod
+    def rank_sources(urls: list[str], headers: dict | None = None, probe_size: int = 256 * 1024, timeout: float = 5):
+        """Measures every source of a file with a short range request, all of them in parallel, and sorts them by
+        throughput.
+
+        Parameters:
+        -----------
+        urls : list[str]
+            The URLs of the same file on different hosts.
+
+        headers : dict | None, optional
+            The headers sent with the requests (default is None).
+
+        probe_size : int, optional
+            The number of bytes read from each source (default is 256 KiB).
+
+        timeout : float, optional
+            The number of seconds each source has to answer and send the probe (default is 5).
+
+        Returns:
+        --------
+        list[str]
+            The sources that sent the file, fastest first. Sources that failed, sent a page instead of the file or
+            report a different size than the fastest one are left out.
+        """
+
+        def probe(url: str):
+            range_headers = dict(headers or {})
+            range_headers.update({
+                "Range": f"bytes=0-{probe_size - 1}"
+            })
+
+            began = time.monotonic()
+            received = 0
+            try:
+                with Download.session.get(url, headers=range_headers, stream=True, timeout=(timeout, timeout)) as response:
+                    # hosts that refuse a link usually answer with an html page instead of an error
+                    if response.status_code not in (200, 206) or 'text/html' in response.headers.get('Content-Type', ''):
+                        return None
+
+                    total_size = response.headers.get('Content-Length', '')
+                    if response.status_code == 206:
+                        total_size = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+
+                    for chunk in response.iter_content(64 * 1024):
+                        received += len(chunk)
+                        if received >= probe_size or time.monotonic() - began > timeout:
+                            break
+
+            except CONNECTION_ERRORS as connection_error:
+                Download.metrics.record('probe_source', time.monotonic() - began, host=urlsplit(url).netloc, error=type(connection_error).__name__)
+                return None
+
+            seconds = time.monotonic() - began
+            Download.metrics.record('probe_source', seconds, host=urlsplit(url).netloc, bytes=received)
+            return received / seconds if seconds else math.inf, int(total_size) if total_size.isdigit() else 0
+
+        if not urls:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            results = list(executor.map(probe, urls))
+
+        ranked = sorted(
+            [(result[0], result[1], url) for url, result in zip(urls, results) if result is not None],
+            key=lambda source: source[0],
+            reverse=True
+        )
+        if not ranked:
+            return []
+
+        # a download can only move between sources of the same file
+        _, total_size, _ = ranked[0]
+        return [url for _, size, url in ranked if size == total_size]
 
     @property
     def progress(self):
@@ -146,30 +797,1120 @@ class Download():
         else:
             return 0
 
-    @classmethod
-    def get_running_count(cls):
-        running_downloads = 0
-        for download in cls.download_list:
-            if download.is_running:
-                running_downloads += 1
-        
-        return running_downloads
-
-    @classmethod
-    def show_all_progress(cls, update=False):
-        """Shows the progress of every download in the terminal.
+    @property
+    def speed(self):
+        """Estimate the current throughput with an exponentially weighted moving average.
 
-        Side Effects:
-        -------------
-        Updates the terminal output with the download progress.
+        Returns:
+        --------
+        float
+            The throughput in bytes per second, which decays towards 0 while no data arrives.
         """
 
-        # updates the previous output if the method has been called recently
-        if update:
-            print("\033[A\033[K"* cls._progress_lines_printed, end='\r')
+        if not self.is_running or not self._speed_weight:
+            return 0
 
-        # reset the attributes related to the method
-        cls._progress_lines_printed = 0
+        # the average starts from 0, so it's divided by the weight of the samples taken so far to remove the bias
+        idle = time.monotonic() - self._last_write
+        return self._speed / self._speed_weight * math.exp(-idle / Download.speed_window)
+
+    @property
+    def eta(self):
+        """Estimate the time left to finish the download.
+
+        Returns:
+        --------
+        float | None
+            The number of seconds left, or None if the size or the throughput is unknown.
+        """
+
+        speed = self.speed
+        if not self.total_size or not speed:
+            return None
+
+        return max(self.total_size - self.written_bytes, 0) / speed
+
+    @classmethod
+    def subscribe(cls, callback):
+        """Registers a function to be called whenever any download starts, writes data or stops.
+
+        The callback is called as `callback(event, download)`, where `event` is 'started', 'progress' or
+        'finished', from the thread running the download, so it should return quickly.
+
+        Parameters:
+        -----------
+        callback : Callable[[str, Download], None]
+            The function to be called.
+        """
+
+        Download._subscribers.append(callback)
+
+    @classmethod
+    def unsubscribe(cls, callback):
+        """Removes a function registered with `subscribe()`.
+
+        Parameters:
+        -----------
+        callback : Callable[[str, Download], None]
+            The function to be removed.
+        """
+
+        if callback in Download._subscribers:
+            Download._subscribers.remove(callback)
+
+    def _notify(self, event: str):
+        for callback in list(Download._subscribers):
+            # a broken subscriber should never break the download itself
+            try:
+                callback(event, self)
+
+            except Exception as error:
+                message = f"Progress subscriber {callback!r} raised {error!r}."
+                warnings.warn(message, RuntimeWarning)
+
+    def _add_written(self, amount: int):
+        """Counts bytes written to the '.part' file and updates the throughput estimate.
+
+        Parameters:
+        -----------
+        amount : int
+            The number of bytes written.
+
+        Side Effects:
+        -------------
+        Notifies the subscribers with a 'progress' event.
+        """
+
+        with self._lock:
+            self.written_bytes += amount
+
+            # weight every sample by the time it covers, so the average doesn't depend on the size of the writes
+            now = time.monotonic()
+            elapsed = now - self._last_write
+            self._last_write = now
+            if elapsed > 0:
+                weight = 1 - math.exp(-elapsed / Download.speed_window)
+                self._speed += weight * (amount / elapsed - self._speed)
+                self._speed_weight += weight * (1 - self._speed_weight)
+
+        self._notify('progress')
+
+    def _throttle(self, amount: int):
+        # the per-download cap is applied before competing for the global bandwidth
+        self._rate_limiter.consume(amount)
+        Download.rate_limiter.consume(amount, self.priority)
+
+    @property
+    def _part_file(self):
+        return f"{self.output_file}.part"
+
+    @property
+    def _journal_file(self):
+        return f"{self.output_file}.part.json"
+
+    def _split_ranges(self):
+        """Splits the file into `segments` ranges of `[start, end, written_bytes]`, or into pieces of `piece_size`
+        bytes for streaming downloads.
+
+        Returns:
+        --------
+        list[list]
+            The ranges, with `end` set to None when the total size is unknown.
+        """
+
+        if not self.total_size:
+            return [[0, None, 0]]
+
+        range_size = -(-self.total_size // self.segments)
+        if self.streaming and self._accepts_ranges:
+            range_size = Download.piece_size
+
+        ranges = []
+        for start in range(0, self.total_size, range_size):
+            end = min(start + range_size, self.total_size) - 1
+            ranges.append([start, end, 0])
+
+        return ranges
+
+    def _journal_matches(self, journal: dict):
+        """Checks if a journal from a previous run still describes the remote file.
+
+        Parameters:
+        -----------
+        journal : dict
+            The loaded journal.
+
+        Returns:
+        --------
+        bool
+            False if the size or any validator known on both sides changed.
+        """
+
+        if not self.total_size or journal["total-size"] != self.total_size:
+            return False
+
+        # validators are only comparable on the same host, mirrors of a file only have the size in common
+        if urlsplit(journal["url"]).netloc != urlsplit(self.url).netloc:
+            return True
+
+        for key in ("etag", "last-modified"):
+            if journal[key] is not None and self._validators[key] is not None and journal[key] != self._validators[key]:
+                return False
+
+        return True
+
+    def _load_journal(self):
+        """Loads the progress of every range from the journal, or splits the file into new ranges.
+
+        Side Effects:
+        -------------
+        Sets `_ranges` and `written_bytes`. Removes the '.part' file and the journal if they don't match the
+        remote file anymore.
+        """
+
+        # an output file without a '.part' file next to it is a finished download, unless it failed its check
+        if os.path.exists(self.output_file) and not os.path.exists(self._part_file):
+            size = os.path.getsize(self.output_file)
+            verdict = integrity.load_verdict(self.output_file)
+            if size == self.total_size and (verdict is None or verdict["valid"]):
+                self._ranges = []
+                self.written_bytes = size
+                return
+
+            if size != self.total_size:
+                message = f"The file at '{self.output_file}' doesn't match the size of the remote file, it will be downloaded again and replaced once complete."
+
+            else:
+                message = f"The file at '{self.output_file}' failed its integrity check, it will be downloaded again and replaced once complete."
+
+            warnings.warn(message, UserWarning)
+
+        journal = None
+        if os.path.exists(self._part_file) and os.path.exists(self._journal_file):
+            with open(self._journal_file, 'r') as file:
+                journal = json.load(file)
+
+        # the url is not compared since direct links usually change between resolutions
+        if journal is not None and self._journal_matches(journal):
+            self._ranges = journal["ranges"]
+
+            # a streaming download keeps the connections it was given, since its ranges are pieces
+            if not self.streaming:
+                self.segments = journal.get("connections", len(self._ranges))
+
+        else:
+            if os.path.exists(self._part_file):
+                message = f"The partial data at '{self._part_file}' doesn't match the remote file anymore, it will be downloaded again from the start."
+                warnings.warn(message, UserWarning)
+
+            self._discard_partial()
+            self._ranges = self._split_ranges()
+
+        self.written_bytes = sum(written for _, _, written in self._ranges)
+
+    def _save_journal(self):
+        # unknown sizes can't be resumed, so there's nothing worth saving
+        if not self.total_size:
+            return
+        
+        with self._lock:
+            journal = {
+                "url": self.url,
+                "etag": self._validators["etag"],
+                "last-modified": self._validators["last-modified"],
+                "total-size": self.total_size,
+                "connections": self.segments,
+                "ranges": self._ranges
+            }
+
+            # write to a temporary file first so a crash never leaves a half written journal
+            with open(f"{self._journal_file}.tmp", 'w') as file:
+                json.dump(journal, file)
+
+            os.replace(f"{self._journal_file}.tmp", self._journal_file)
+
+    def _discard_partial(self):
+        for path in (self._part_file, self._journal_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+        with self._check_lock:
+            self._check = None
+
+    @staticmethod
+    def _range_done(byte_range: list):
+        start, end, written = byte_range
+        return end is not None and start + written > end
+
+    def _range_headers(self, byte_range: list):
+        """Builds the headers used to request the remaining bytes of a range.
+
+        Parameters:
+        -----------
+        byte_range : list
+            The range to request, as `[start, end, written_bytes]`.
+
+        Returns:
+        --------
+        tuple[dict, bool]
+            The headers and whether they request only part of the file.
+        """
+
+        start, end, written = byte_range
+        position = start + written
+        headers = self._headers.copy()
+        
+        # the whole file is requested without a range so servers that don't support them still work
+        partial = position > 0 or (end is not None and end < self.total_size - 1)
+        if partial:
+            headers.update({
+                "Range": f"bytes={position}-{end if end is not None else ''}"
+            })
+
+            # only resume if the remote file is the same, otherwise the server sends all of it
+            validator = self._validators["etag"]
+            if validator is None or validator.startswith('W/'):
+                validator = self._validators["last-modified"]
+
+            if validator is not None:
+                headers.update({
+                    "If-Range": validator
+                })
+
+        return headers, partial
+
+    def _open_range(self, byte_range: list):
+        """Requests the remaining bytes of a range.
+
+        Parameters:
+        -----------
+        byte_range : list
+            The range to request, as `[start, end, written_bytes]`.
+
+        Returns:
+        --------
+        requests.Response | None
+            The response streaming the remaining bytes, or None if the server sent the whole file instead, which
+            means the remote file changed or the server doesn't support resuming.
+
+        Raises:
+        -------
+        requests.RequestException:
+            If the request returns an unexpected status code.
+        """
+
+        headers, partial = self._range_headers(byte_range)
+        response = Download.session.get(self.url, headers=headers, stream=True, timeout=Download.timeout)
+        if response.status_code == 206 and partial or response.status_code == 200 and not partial:
+            return response
+        
+        response.close()
+        if response.status_code == 200:
+            return None
+
+        message = f"Unexpected status code: {response.status_code}."
+        raise requests.RequestException(message, response=response)
+
+    def _open_ranges(self):
+        """Requests the first `segments` ranges that aren't complete yet, starting over if the remote file changed.
+
+        Returns:
+        --------
+        list[tuple[list, requests.Response]]
+            The first incomplete ranges, one per connection, along with the responses streaming them. The
+            connections request the other ranges once they're done with these.
+
+        Raises:
+        -------
+        requests.RequestException:
+            If any request returns an unexpected status code.
+        """
+
+        for attempt in range(2):
+            responses = []
+            for byte_range in self._ranges:
+                if Download._range_done(byte_range) or len(responses) == self.segments:
+                    continue
+
+                response = self._open_range(byte_range)
+                if response is None:
+                    break
+
+                responses.append((byte_range, response))
+
+            else:
+                return responses
+
+            for _, response in responses:
+                response.close()
+
+            # the file changed since the size was probed, so probe it again and start over
+            Download.metrics.record('restart', host=urlsplit(self.url).netloc)
+            message = f"The remote file at '{self.url}' changed or can't be resumed, downloading it again from the start."
+            warnings.warn(message, UserWarning)
+
+            self.total_size, _, self._validators = Download._probe(self.url, self._headers)
+            self._discard_partial()
+            self._ranges = self._split_ranges()
+            self.written_bytes = 0
+
+        message = f"The server keeps sending the whole file for '{self.url}' instead of the requested ranges."
+        raise requests.RequestException(message)
+
+    @staticmethod
+    def _get_reader(response: requests.Response):
+        """Gets a function that reads the body of a response into a buffer.
+
+        Parameters:
+        -----------
+        response : requests.Response
+            The response streaming the body.
+
+        Returns:
+        --------
+        Callable[[memoryview], int]
+            A function that fills as much of the buffer as it can and returns the number of bytes read, or 0 once
+            the body ends.
+        """
+
+        # 'readinto()' of urllib3 reads into a new bytes object and copies it, while the underlying 'http.client'
+        # response reads from the socket straight into the buffer, which takes about 20% less CPU on fast
+        # connections. That response is private, so it's only used on the urllib3 versions known to have it and
+        # when the body doesn't need to be decoded
+        encoding = response.headers.get('Content-Encoding', 'identity').lower()
+        connection = getattr(response.raw, '_fp', None)
+        if encoding == 'identity' and READS_FROM_FP and isinstance(connection, http.client.HTTPResponse):
+            return connection.readinto
+
+        # the public reader works on any version
+        response.raw.decode_content = True
+        return response.raw.readinto
+
+    @staticmethod
+    def _adapt_chunk_size(chunk_size: int, seconds: float):
+        # aim for a buffer that takes between 50 and 500 milliseconds to fill, so slow connections still report
+        # progress often and fast ones make few large writes
+        if seconds < 0.05:
+            return min(chunk_size * 2, Download.max_chunk_size)
+
+        if seconds > 0.5:
+            return max(chunk_size // 2, Download.min_chunk_size)
+
+        return chunk_size
+
+    def _download_range(self, byte_range: list, response: requests.Response):
+        """Streams the remaining bytes of a range into its offset of the '.part' file.
+
+        The body is read into a reusable buffer which is only written once it's full, so every write to the file
+        covers many reads from the connection.
+
+        Parameters:
+        -----------
+        byte_range : list
+            The range to download, as `[start, end, written_bytes]`.
+
+        response : requests.Response
+            The response streaming the range.
+
+        Returns:
+        --------
+        str | None
+            The name of the error that broke the connection, 'IncompleteRead' if it ended before the range was
+            complete, 'SlowSource' if its throughput collapsed while there are mirrors left, or None if the range
+            ended normally or the download was interrupted.
+        """
+
+        start, end, _ = byte_range
+        read = Download._get_reader(response)
+        chunk_size = Download.chunk_size or Download.min_chunk_size
+        buffer = None
+
+        # the range only advances once the writer saves the data, so the offset read so far is kept apart
+        position = start + byte_range[2]
+
+        # what's measured about the transfer, recorded once it ends
+        transfer_began = time.monotonic()
+        first_byte_seconds = None
+        transferred = 0
+        stalls = 0
+        error = None
+
+        # throughput of the current window, compared against the best one to notice the source slowing down
+        window_began = transfer_began
+        window_bytes = 0
+
+        ended = False
+        while not ended:
+            # a buffer handed to the writer can't be read into until it's written, so take another one
+            if buffer is None or len(buffer) != chunk_size:
+                buffer = Download.disk_writer.get_buffer(chunk_size)
+                    
+            view = memoryview(buffer)
+
+            # never read past the end of the range
+            limit = chunk_size
+            if end is not None:
+                limit = min(chunk_size, end + 1 - position)
+                
+            began = time.monotonic()
+            filled = 0
+            try:
+                while filled < limit:
+                    read_began = time.monotonic()
+                    count = read(view[filled:limit])
+                    if time.monotonic() - read_began >= Download.stall_time:
+                        stalls += 1
+
+                    if not count:
+                        ended = True
+                        break
+
+                    if first_byte_seconds is None:
+                        first_byte_seconds = time.monotonic() - transfer_began
+
+                    self._throttle(count)
+                    filled += count
+
+                    if self._interrupt_download:
+                        ended = True
+                        break
+
+            # a broken connection leaves the range incomplete, which the journal allows to resume later
+            except CONNECTION_ERRORS as connection_error:
+                error = type(connection_error).__name__
+                ended = True
+
+            read_seconds = time.monotonic() - began
+            if filled:
+                try:
+                    Download.disk_writer.write(self, byte_range, buffer, filled)
+
+                except OSError as disk_error:
+                    self._fail_disk(disk_error)
+                    error = None
+                    break
+
+                buffer = None
+
+            transferred += filled
+            position += filled
+            self._add_written(filled)
+
+            if end is not None and position > end:
+                ended = True
+
+            window_bytes += filled
+            window_seconds = time.monotonic() - window_began
+            if not ended and window_seconds >= Download.collapse_window:
+                if self._source_collapsed(window_bytes / window_seconds):
+                    error = 'SlowSource'
+                    ended = True
+
+                window_began = time.monotonic()
+                window_bytes = 0
+
+            if Download.chunk_size is None:
+                chunk_size = Download._adapt_chunk_size(chunk_size, read_seconds)
+
+        # the range has to be up to date before it's requested again
+        try:
+            Download.disk_writer.drain(self, byte_range)
+
+        except OSError as disk_error:
+            self._fail_disk(disk_error)
+            error = None
+        
+        response.close()
+
+        # a connection closed by the server without an error is still a broken one if the range isn't complete
+        if error is None and end is not None and not self._interrupt_download and not self._failed and not Download._range_done(byte_range):
+            error = 'IncompleteRead'
+
+        seconds = time.monotonic() - transfer_began
+        Download.metrics.record(
+            'transfer',
+            seconds,
+            host=urlsplit(self.url).netloc,
+            bytes=transferred,
+            bytes_per_second=round(transferred / seconds) if seconds else None,
+            headers_seconds=response.elapsed.total_seconds(),
+            first_byte_seconds=round(first_byte_seconds, 6) if first_byte_seconds is not None else None,
+            stalls=stalls,
+            error=error
+        )
+
+        return error
+
+    def _fail_disk(self, error: OSError):
+        # a disk that's full or failing won't get better by reconnecting
+        if not self._failed:
+            message = f"Can't write to '{self._part_file}': {error}"
+            warnings.warn(message, RuntimeWarning)
+
+        self._failed = True
+
+    def _source_collapsed(self, speed: float):
+        # a collapse is only worth noticing if there's a mirror to move to and the speed isn't capped on purpose
+        if not self.mirrors or self._rate_limiter.rate or Download.rate_limiter.rate:
+            return False
+
+        with self._source_lock:
+            self._peak_speed = max(self._peak_speed, speed)
+            return speed < self._peak_speed * Download.collapse_ratio
+
+    def _switch_source(self, failed_url: str):
+        """Moves the download to the next mirror that has a file of the same size, unless another range already
+        moved it away from `failed_url`.
+
+        Parameters:
+        -----------
+        failed_url : str
+            The URL the range was using when it failed.
+
+        Returns:
+        --------
+        bool
+            True if the download now has a source other than `failed_url`.
+        """
+
+        with self._source_lock:
+            if self.url != failed_url:
+                return True
+
+            while self.mirrors:
+                url = self.mirrors.pop(0)
+                try:
+                    total_size, _, validators = Download._probe(url, self._headers)
+
+                except CONNECTION_ERRORS:
+                    continue
+
+                # the bytes already written can only be completed by the same file
+                if not self.total_size or total_size != self.total_size:
+                    continue
+
+                Download.metrics.record('failover', host=urlsplit(failed_url).netloc, mirror=urlsplit(url).netloc)
+                message = f"Moving '{self.output_file}' from '{urlsplit(failed_url).netloc}' to '{urlsplit(url).netloc}'."
+                warnings.warn(message, UserWarning)
+
+                self.url = url
+                self._validators = validators
+                self._peak_speed = 0
+                self._save_journal()
+                return True
+
+            return False
+
+    @staticmethod
+    def _backoff_delay(retries: int):
+        # exponential backoff with jitter, so ranges that broke at the same time don't all retry at once
+        delay = min(Download.retry_backoff * 2 ** (retries - 1), Download.max_backoff)
+        return random.uniform(delay / 2, delay)
+
+    def _wait_backoff(self, retries: int):
+        # sleep in short steps so 'stop()' doesn't have to wait for the whole backoff
+        deadline = time.monotonic() + Download._backoff_delay(retries)
+        while not self._interrupt_download and time.monotonic() < deadline:
+            time.sleep(min(0.1, deadline - time.monotonic()))
+
+        return not self._interrupt_download
+
+    def _transfer_range(self, byte_range: list, response: requests.Response | None):
+        """Downloads a range, reconnecting from its current offset whenever the connection breaks, stalls or ends
+        early.
+
+        Retries wait for an exponential backoff with jitter. After `max_retries` retries in a row without any new
+        data, or once the source answers with a client error, changes or collapses, the download moves to the next
+        of its `mirrors`, and it gives up once there are none left.
+
+        Parameters:
+        -----------
+        byte_range : list
+            The range to download, as `[start, end, written_bytes]`.
+
+        response : requests.Response | None
+            The response streaming the range, or None to request it first.
+
+        Side Effects:
+        -------------
+        Marks the download as failed if the range could not be completed.
+        """
+
+        retries = 0
+        error = None
+        while True:
+            written_before = byte_range[2]
+            source = self.url
+            if response is not None:
+                error = self._download_range(byte_range, response)
+
+            # a stream without a known size is only complete once it ends without errors
+            if response is not None and error is None or self._interrupt_download:
+                return
+
+            # only consecutive failures count towards the limit
+            if byte_range[2] > written_before:
+                retries = 0
+
+            # a collapsed source is left right away, the slow connection already counts as the failure
+            if error == 'SlowSource' and self._switch_source(source):
+                source = self.url
+                retries = 0
+
+            response = None
+            while response is None:
+                if retries >= Download.max_retries:
+                    if self._switch_source(source):
+                        source = self.url
+                        retries = 0
+
+                    else:
+                        message = f"Giving up on '{self.output_file}' after {retries} retries ({error})."
+                        warnings.warn(message, RuntimeWarning)
+                        self._failed = True
+                        return
+
+                # a range that was never requested is opened right away, only reconnections wait
+                if error is not None:
+                    retries += 1
+                    Download.metrics.record('reconnect', host=urlsplit(source).netloc, retries=1, error=error)
+                    if not self._wait_backoff(retries):
+                        return
+
+                source = self.url
+                try:
+                    response = self._open_range(byte_range)
+
+                except CONNECTION_ERRORS as connection_error:
+                    # client errors like 403 or 404 won't go away by retrying, but a mirror may still work
+                    status_code = getattr(getattr(connection_error, 'response', None), 'status_code', None)
+                    if status_code is not None and status_code < 500:
+                        if self._switch_source(source):
+                            retries = 0
+                            continue
+
+                        message = f"Can't reconnect to '{source}': {connection_error}"
+                        warnings.warn(message, RuntimeWarning)
+                        self._failed = True
+                        return
+
+                    error = type(connection_error).__name__
+                    continue
+
+                # the remote file changed, so the bytes already written can't be completed with the new ones
+                if response is None:
+                    if self._switch_source(source):
+                        retries = 0
+                        continue
+
+                    message = f"The remote file at '{source}' changed during the download. Start it again to download it from the start."
+                    warnings.warn(message, RuntimeWarning)
+                    self._failed = True
+                    return
+
+            if len(self._ranges) == 1:
+                self.response = response
+
+    def _next_range(self):
+        """Claims the next range that's missing and not being downloaded by another connection.
+
+        Returns:
+        --------
+        list | None
+            The first such range from the position last read, or from the start of the file if there's none after
+            it, or None if every range is complete or claimed.
+        """
+
+        with self._lock:
+            missing = [
+                byte_range for byte_range in self._ranges
+                if not Download._range_done(byte_range) and id(byte_range) not in self._claimed
+            ]
+            if not missing:
+                return None
+
+            # the bytes after the playhead are the ones a player needs next, the ones before it were skipped
+            ahead = [byte_range for byte_range in missing if byte_range[1] is None or byte_range[1] >= self._playhead]
+            byte_range = min(ahead or missing)
+
+            # a piece the player seeked into starts at the playhead, the bytes before it are left as a piece of their own
+            start, end, written = byte_range
+            if not written and start < self._playhead <= end:
+                self._ranges.insert(self._ranges.index(byte_range), [start, self._playhead - 1, 0])
+                byte_range[0] = self._playhead
+
+            self._claimed.add(id(byte_range))
+            return byte_range
+
+    def _transfer_ranges(self, byte_range: list, response: requests.Response):
+        # a connection keeps taking ranges until none are left, so there are never more than `segments` of them
+        while byte_range is not None:
+            self._transfer_range(byte_range, response)
+            if self._interrupt_download or self._failed:
+                return
+
+            byte_range, response = self._next_range(), None
+
+    def _available(self, offset: int):
+        # the number of bytes from 'offset' on that can already be read from the file
+        if not self._ranges:
+            return max(self.written_bytes - offset, 0)
+
+        for start, _, written in self._ranges:
+            if start <= offset < start + written:
+                return start + written - offset
+
+        return 0
+
+    def _wake_readers(self):
+        with self._readable:
+            self._readable.notify_all()
+
+    def read_at(self, offset: int, size: int, timeout: float | None = None):
+        """Reads bytes of the file while it's downloaded, blocking until they're written.
+
+        The offset becomes the playhead of the download, so the connections fetch the pieces from there on before
+        any others, which keeps a player that seeks from waiting on the rest of the file.
+
+        Parameters:
+        -----------
+        offset : int
+            The offset of the first byte to read.
+
+        size : int
+            The maximum number of bytes to read.
+
+        timeout : float | None, optional
+            Maximum number of seconds to wait for the first byte (default is None, which waits indefinitely).
+
+        Returns:
+        --------
+        bytes
+            The bytes written from `offset` on, up to `size` of them. Empty if `offset` is past the end of the file,
+            the timeout expired, or the download stopped or failed before the bytes were written.
+
+        Raises:
+        -------
+        ValueError:
+            If the download is not complete and was not created with `streaming=True`, since its writes may still
+            be buffered.
+        """
+
+        if not self.streaming and self.progress < 100:
+            message = f"Can't read '{self.output_file}' while it's downloaded, unless it's created with 'streaming=True'."
+            raise ValueError(message)
+
+        if self.total_size and offset >= self.total_size:
+            return b''
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._readable:
+            self._playhead = offset
+            while True:
+                available = self._available(offset)
+                if available:
+                    break
+
+                # a download that hasn't started yet will get to the bytes, one that already ran won't
+                if not self.is_running and self._ended:
+                    return b''
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return b''
+
+                self._readable.wait(remaining)
+
+        # the '.part' file is only renamed once it's complete, and not while it's being read
+        with self._file_lock:
+            path = self._part_file if os.path.exists(self._part_file) else self.output_file
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                return file.read(min(size, available))
+
+    def open_stream(self):
+        """Opens the file for reading in order while it's downloaded.
+
+        Returns:
+        --------
+        DownloadStream
+            A file-like object whose reads block until the bytes are written.
+        """
+
+        return DownloadStream(self)
+
+    def _contiguous_size(self):
+        # the number of bytes from the start of the file that are already written, with no gaps
+        size = 0
+        for start, end, written in sorted(self._ranges):
+            if start != size:
+                break
+
+            size = start + written
+            if not Download._range_done([start, end, written]):
+                break
+
+        return size
+
+    def _get_check(self):
+        # only called while holding '_check_lock', since the writer and the download thread both use the check
+        if self._check is None:
+            self._check = integrity.IntegrityCheck(self.total_size, integrity.IntegrityCheck.get_container(self.output_file))
+
+        return self._check
+
+    def _check_written(self, offset: int, data: memoryview):
+        """Hashes and checks data right after it's written, if it continues the bytes checked so far.
+
+        Runs on the writer thread, so data that doesn't continue the check is left to `_catch_up_check()` instead
+        of being read back there.
+
+        Parameters:
+        -----------
+        offset : int
+            The offset the data was written at.
+
+        data : memoryview
+            The data that was written.
+        """
+
+        if not Download.verify:
+            return
+
+        with self._check_lock:
+            check = self._get_check()
+            if offset == check.position:
+                check.update(data)
+
+    def _catch_up_check(self):
+        """Reads back and checks the bytes written with no gaps before them that weren't checked as they were
+        written, like the ones of an earlier run or of the later ranges of a segmented download.
+
+        Only runs on the download's own thread, so reading back doesn't hold up the writes of other downloads, and
+        only on bytes that are already on the file.
+        """
+
+        target = self._contiguous_size()
+        with self._check_lock:
+            if self._get_check().position >= target:
+                return
+
+        with open(self._part_file, 'rb') as file:
+            while True:
+                # the lock is taken for each chunk, so the writer can keep checking new data in between
+                with self._check_lock:
+                    check = self._get_check()
+                    if check.position >= target:
+                        return
+
+                    file.seek(check.position)
+                    data = file.read(min(Download.max_chunk_size, target - check.position))
+                    if not data:
+                        return
+
+                    check.read_back += len(data)
+                    check.update(data)
+
+    def _finish_check(self):
+        """Checks the bytes of the '.part' file that weren't checked as they were written and gets the verdict.
+
+        Returns:
+        --------
+        dict | None
+            The verdict of the check, or None if `verify` is disabled.
+        """
+
+        if not Download.verify:
+            return None
+
+        # a stream without a known size only gets its size once it ends
+        with self._check_lock:
+            check = self._get_check()
+            check.total_size = self.total_size
+
+        self._catch_up_check()
+
+        verdict = check.get_verdict()
+        Download.metrics.record(
+            'verify',
+            bytes=check.position,
+            read_back=check.read_back,
+            error=None if verdict["valid"] else 'Invalid'
+        )
+        return verdict
+
+    def _create_part_file(self):
+        """Creates the '.part' file with the size of the whole file, so every range can write at its own offset.
+
+        Where the system supports it, the space is reserved on the disk up front, so files downloaded at the same
+        time don't fragment each other and a full disk is noticed before any data is transferred.
+
+        Raises:
+        -------
+        OSError:
+            If there isn't enough free space for the rest of the file.
+        """
+
+        if not os.path.exists(self._part_file):
+            open(self._part_file, 'wb').close()
+
+        # a stream without a known size can only grow as it's written
+        if not self.total_size:
+            return
+
+        # blocks taken by a previous run don't count, sparse files only take the ones written so far
+        stat = os.stat(self._part_file)
+        allocated = stat.st_blocks * 512 if hasattr(stat, 'st_blocks') else stat.st_size
+        needed = self.total_size - allocated
+        free = shutil.disk_usage(os.path.dirname(os.path.abspath(self._part_file))).free
+        if needed > free:
+            message = f"Not enough free space for '{self.output_file}': {needed} bytes needed, {free} available."
+            raise OSError(errno.ENOSPC, message)
+
+        with open(self._part_file, 'r+b') as file:
+            # only some systems and filesystems can reserve the blocks, the others get a sparse file
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(file.fileno(), 0, self.total_size)
+                    return
+
+                except OSError:
+                    pass
+
+            if stat.st_size < self.total_size:
+                file.truncate(self.total_size)
+        
+    def _complete(self):
+        """Renames the '.part' file to the output file if every byte was written, or saves the journal otherwise.
+        
+        Warns:
+        ------
+        RuntimeWarning:
+            If the transfer ended before the file was complete without being interrupted.
+        """
+
+        # a stream without a known size is complete as soon as it ends, unless it ended with an error
+        if not self.total_size and not self._interrupt_download and not self._failed:
+            self.total_size = self.written_bytes
+            self._ranges[0][1] = self.written_bytes - 1
+
+        # only replace the output file once every byte has been written
+        if all(Download._range_done(byte_range) for byte_range in self._ranges):
+            verdict = self._finish_check()
+            with self._file_lock:
+                os.replace(self._part_file, self.output_file)
+            if os.path.exists(self._journal_file):
+                os.remove(self._journal_file)
+
+            # the verdict lets later runs trust or replace the file without reading it again
+            if verdict is not None:
+                integrity.save_verdict(self.output_file, verdict)
+                if not verdict["valid"]:
+                    message = f"The file at '{self.output_file}' failed its integrity check: {' '.join(verdict['errors'])}"
+                    warnings.warn(message, RuntimeWarning)
+        
+        else:
+            self._save_journal()
+            if not self._interrupt_download:
+                message = f"The connection for '{self.output_file}' ended before the download was complete ({self.written_bytes}/{self.total_size} bytes). Start it again to resume."
+                warnings.warn(message, RuntimeWarning)
+
+    def _download(self, responses: list):
+        try:
+            # the file was already created on 'start()', unless the remote file changed and it was discarded
+            try:
+                self._create_part_file()
+
+            except OSError as error:
+                self._fail_disk(error)
+                return
+
+            # the bytes of an earlier run are checked before new ones arrive, so the rest can be checked in memory,
+            # but a stream is read back at the end instead of delaying the player
+            if Download.verify and not self.streaming:
+                try:
+                    self._catch_up_check()
+
+                except OSError as error:
+                    self._fail_disk(error)
+                    return
+        
+            # every connection starts on a range opened by 'start()' and then moves on to the next missing one
+            self._claimed = {id(byte_range) for byte_range, _ in responses}
+            if len(responses) == 1:
+                self._transfer_ranges(*responses[0])
+        
+            else:
+                threads = []
+                for byte_range, response in responses:
+                    thread = threading.Thread(target=self._transfer_ranges, args=(byte_range, response), daemon=True)
+                    thread.start()
+                    threads.append(thread)
+
+                for thread in threads:
+                    thread.join()
+
+            # the file is only complete once the writer is done with it
+            try:
+                Download.disk_writer.close(self)
+
+            except OSError as error:
+                self._fail_disk(error)
+        
+            self._complete()
+
+        finally:
+            # release the connections as soon as the transfer ends
+            for _, response in responses:
+                response.close()
+
+            self.response = None
+            self._set_finished()
+
+    def _set_finished(self):
+        self.is_running = False
+        self._interrupt_download = False
+        self._ended = True
+        self._finished.set()
+        self._notify('finished')
+
+        # readers waiting on bytes that won't come anymore can return
+        self._wake_readers()
+
+    def _set_started(self):
+        self.is_running = True
+        self._ended = False
+        self._failed = False
+        self._finished.clear()
+        self._speed = 0
+        self._speed_weight = 0
+        self._last_write = time.monotonic()
+        self._notify('started')
+
+    @classmethod
+    def get_running_count(cls):
+        running_downloads = 0
+        for download in cls.download_list:
+            if download.is_running:
+                running_downloads += 1
+        
+        return running_downloads
+
+    @classmethod
+    def show_all_progress(cls, update=False):
+        """Shows the progress of every download in the terminal.
+
+        Side Effects:
+        -------------
+        Updates the terminal output with the download progress.
+        """
+
+        # updates the previous output if the method has been called recently
+        if update:
+            print("\033[A\033[K"* cls._progress_lines_printed, end='\r')
+
+        # reset the attributes related to the method
+        cls._progress_lines_printed = 0
 
         # print one download per line
         for download in cls.download_list:
@@ -199,22 +1940,22 @@ class Download():
         Updates the terminal output with the download progress.
         """
 
-        while True:
-            wait = False
-            for download in cls.download_list:
-                if download.progress >= 100:
-                    continue
-
-                elif download.is_running:
-                    wait = True
+        renderer = ProgressRenderer(cls) if show_progress else None
+        if renderer is not None:
+            renderer.start()
 
-            if show_progress:
-                cls.show_all_progress(True)
+        try:
+            while True:
+                running = [download for download in cls.download_list if download.is_running]
+                if not running:
+                    break
 
-            if not wait:
-                break
+                # block on the first running download, the progress is drawn on its own thread
+                running[0]._finished.wait()
             
-            time.sleep(0.2)
+        finally:
+            if renderer is not None:
+                renderer.stop()
     
     @classmethod
     def stop_all(cls):
@@ -229,8 +1970,21 @@ class Download():
             if download.is_running:
                 download.stop()
     
-    def start(self):
+    def start(self, blocking: bool = False):
         """Starts the download process in a separate thread.
+
+        Parameters:
+        -----------
+        blocking : bool, optional
+            If True, runs the download on the calling thread and only returns once it ends (default is False).
+        
+        Raises:
+        -------
+        requests.RequestException:
+            If the request to get the file returns an unexpected status code.
+        
+        OSError:
+            If there isn't enough free space for the rest of the file.
         
         Warns:
         ------
@@ -242,24 +1996,6 @@ class Download():
         Spawns a new thread to handle the download process.
         """
 
-        def download():
-            self.is_running = True
-            with open(self.output_file, 'ab') as file:
-                for chunk in self.response.iter_content(chunk_size=8192):
-                    if chunk:
-                        self.written_bytes += len(chunk)
-                        file.write(chunk)
-
-                    if self._interrupt_download:
-                        self.written_bytes = os.path.getsize(self.output_file)
-                        break
-                
-                if not self._interrupt_download:
-                    self.total_size = self.written_bytes
-                    
-            self.is_running = False
-            self._interrupt_download = False
-
         if self.progress >= 100:
             message = "Can't start a download that's already finished."
             warnings.warn(message, RuntimeWarning)
@@ -270,7 +2006,25 @@ class Download():
             warnings.warn(message, RuntimeWarning)
             return
         
-        threading.Thread(target=download, daemon=True).start()
+        # mark as running before the thread starts so 'stop()' can't miss it
+        self._set_started()
+
+        try:
+            self._create_part_file()
+            responses = self._open_ranges()
+
+        except Exception:
+            self._set_finished()
+            raise
+
+        if len(responses) == 1:
+            self.response = responses[0][1]
+
+        if blocking:
+            self._download(responses)
+
+        else:
+            threading.Thread(target=self._download, args=(responses,), daemon=True).start()
     
     def stop(self):
         """Stops the current download if it is running.
@@ -292,9 +2046,626 @@ class Download():
         
         # set flag to interrupt the download thread and wait for it to properly stop
         self._interrupt_download = True
-        while self.is_running:
-            time.sleep(0.0001)
+        self._finished.wait()
+
+    def wait(self, timeout: float | None = None):
+        """Blocks until the download stops running.
+
+        Parameters:
+        -----------
+        timeout : float | None, optional
+            Maximum number of seconds to wait (default is None, which waits indefinitely).
+        
+        Returns:
+        --------
+        bool
+            True if the download is not running anymore, False if the timeout expired first.
+        """
+
+        return self._finished.wait(timeout)
+
+
+class DownloadStream(io.RawIOBase):
+    """A read-only file-like object over a download that's still running, whose reads block until the bytes
+    are written.
+
+    Seeking moves the playhead of the download, so the bytes after the new position are fetched first.
+
+    Attributes:
+    -----------
+    download : Download
+        The download being read, which has to be created with `streaming=True` unless it's complete.
+
+    timeout : float | None
+        The maximum number of seconds a read waits for its first byte before it returns nothing, or None to wait
+        indefinitely.
+    """
+
+    def __init__(self, download: Download, timeout: float | None = None):
+        """Initializes a DownloadStream instance.
+
+        Parameters:
+        -----------
+        download : Download
+            The download to read.
+
+        timeout : float | None, optional
+            The maximum number of seconds a read waits for its first byte (default is None, which waits
+            indefinitely).
+        """
+
+        super().__init__()
+        self.download = download
+        self.timeout = timeout
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.download.read_at(self._position, len(buffer), self.timeout)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+
+        elif whence == io.SEEK_END:
+            offset += self.download.total_size
+
+        if offset < 0:
+            message = f"Invalid offset {offset}, it's before the start of the file."
+            raise ValueError(message)
+
+        self._position = offset
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+class DownloadManager():
+    """Runs downloads from a work queue on a bounded pool of worker threads.
+
+    Every submitted download gets a `Future` that is resolved when it ends, and the number of downloads that can
+    be queued or running at the same time is bounded by a semaphore, so waiting for a free slot or for every
+    download to finish blocks on synchronization primitives instead of polling.
+
+    Event-driven downloads, like the ones of the asyncio engine, are started right away instead, without a slot
+    or a worker thread, since their own engine limits how many of them stream at once.
+
+    Attributes:
+    -----------
+    max_downloads : int
+        The maximum number of concurrent downloads.
+    """
+
+    def __init__(self, max_downloads: int = 3):
+        """Initializes a DownloadManager instance and starts its worker threads.
+
+        Parameters:
+        -----------
+        max_downloads : int, optional
+            The maximum number of concurrent downloads (default is 3).
+        """
+
+        self.max_downloads = max_downloads
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(max_downloads)
+        self._workers = []
+        self._lock = threading.Lock()
+        self._event_driven = set()
+
+        for _ in range(max_downloads):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            download, future = item
+            try:
+                if future.set_running_or_notify_cancel():
+                    download.start(blocking=True)
+                    future.set_result(download)
+            
+            except Exception as error:
+                future.set_exception(error)
+
+            finally:
+                self._slots.release()
+                self._queue.task_done()
+
+    def submit(self, download: Download):
+        """Queues a download, blocking while every slot is taken.
+
+        Parameters:
+        -----------
+        download : Download
+            The download to be started.
         
+        Returns:
+        --------
+        concurrent.futures.Future
+            A future resolved with the download once it ends.
+        """
+
+        future = Future()
+        if download.event_driven:
+            self._start_event_driven(download, future)
+            return future
+
+        self._slots.acquire()
+        self._queue.put((download, future))
+        return future
+
+    def _start_event_driven(self, download: Download, future: Future):
+        future.set_running_or_notify_cancel()
+        try:
+            download.start()
+
+        except Exception as error:
+            future.set_exception(error)
+            return
+
+        # a download that was already finished isn't scheduled at all
+        if download._future is None or download._future.done() and not download.is_running:
+            future.set_result(download)
+            return
+
+        with self._lock:
+            self._event_driven.add(future)
+
+        def finish(download_future):
+            if download_future.cancelled() or download_future.exception() is None:
+                future.set_result(download)
+
+            else:
+                future.set_exception(download_future.exception())
+
+            with self._lock:
+                self._event_driven.discard(future)
+
+        download._future.add_done_callback(finish)
+
+    def wait_slot(self):
+        """Blocks until there's a free slot for a new download."""
+
+        self._slots.acquire()
+        self._slots.release()
+
+    def wait_all(self):
+        """Blocks until every submitted download ends."""
+
+        self._queue.join()
+        with self._lock:
+            event_driven = list(self._event_driven)
+
+        wait(event_driven)
+
+    def shutdown(self):
+        """Stops the worker threads once the queued downloads end."""
+
+        for _ in self._workers:
+            self._queue.put(None)
+
+        for worker in self._workers:
+            worker.join()
+
+
+class SmallFileFetcher():
+    """Fetches small files, like subtitles, without the probe, journal, thread and progress row of a Download.
+
+    Each file takes a single request over the keep-alive connections pooled by `Download.session`, with many of
+    them in flight at once on a pool of threads. The body is read into memory and written to a '.part' file with
+    a single call, which is then renamed to the output file, so the output file is either complete or missing.
+    A file that turns out to be larger than `max_size` is streamed to the '.part' file instead.
+
+    Attributes:
+    -----------
+    max_size : int
+        A class-level size, in bytes, under which a download is considered small.
+
+    extensions : tuple[str]
+        A class-level list of the extensions of files that are always considered small, like subtitles.
+
+    max_workers : int
+        The maximum number of files fetched at the same time.
+
+    fetched : int
+        The number of files fetched so far.
+
+    failed : int
+        The number of files that could not be fetched.
+    """
+
+    max_size = 1024 * 1024
+    extensions = ('.srt', '.vtt', '.ass', '.ssa', '.sub')
+
+    def __init__(self, max_workers: int = 32):
+        """Initializes a SmallFileFetcher instance.
+
+        Parameters:
+        -----------
+        max_workers : int, optional
+            The maximum number of files fetched at the same time (default is 32, the size of the connection pools
+            of `Download.session`).
+        """
+
+        self.max_workers = max_workers
+        self.fetched = 0
+        self.failed = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def is_small(cls, output_file: str, size: int = 0):
+        """Checks if a file should be fetched by a SmallFileFetcher.
+
+        Parameters:
+        -----------
+        output_file : str
+            The file path where the content will be saved.
+
+        size : int, optional
+            The size of the file, if it was already probed (default is 0, for an unknown size).
+
+        Returns:
+        --------
+        bool
+            True if the file has one of the `extensions` or its size is known and up to `max_size`.
+        """
+
+        return os.path.splitext(output_file)[1].lower() in cls.extensions or 0 < size <= cls.max_size
+
+    def submit(self, urls: list[str], output_file: str, headers: dict | None = None):
+        """Queues a file to be fetched, without blocking.
+
+        Parameters:
+        -----------
+        urls : list[str]
+            The URLs of the file, tried in order until one of them works.
+
+        output_file : str
+            The file path where the content will be saved.
+
+        headers : dict | None, optional
+            The headers of the requests (default is None).
+
+        Returns:
+        --------
+        concurrent.futures.Future
+            A future resolved with True once the file is saved, or False if it could not be fetched.
+        """
+
+        return self._executor.submit(self._fetch, list(urls), output_file, headers or {})
+
+    def _fetch(self, urls: list[str], output_file: str, headers: dict):
+        error = None
+        for url in urls:
+            retries = 0
+            while True:
+                try:
+                    self._fetch_url(url, output_file, headers)
+                    with self._lock:
+                        self.fetched += 1
+
+                    return True
+
+                except CONNECTION_ERRORS as connection_error:
+                    error = connection_error
+
+                # client errors like 403 or 404 won't go away by retrying, but the next url may still work
+                status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+                if status_code is not None and status_code < 500 or retries >= Download.max_retries:
+                    break
+
+                retries += 1
+                time.sleep(Download._backoff_delay(retries))
+
+        with self._lock:
+            self.failed += 1
+
+        message = f"Could not fetch '{output_file}': {error}"
+        warnings.warn(message, RuntimeWarning)
+        return False
+
+    def _fetch_url(self, url: str, output_file: str, headers: dict):
+        """Fetches a file from a single URL and saves it.
+
+        Parameters:
+        -----------
+        url : str
+            The URL of the file.
+
+        output_file : str
+            The file path where the content will be saved.
+
+        headers : dict
+            The headers of the request.
+
+        Raises:
+        -------
+        requests.RequestException:
+            If the request returns an unexpected status code or the connection breaks.
+        """
+
+        part_file = f"{output_file}.part"
+        with Download.metrics.timed('small_file', host=urlsplit(url).netloc) as event:
+            response = Download.session.get(url, headers=headers, stream=True, timeout=Download.timeout)
+            try:
+                if response.status_code != 200:
+                    message = f"Unexpected status code: {response.status_code}."
+                    raise requests.RequestException(message, response=response)
+
+                size = int(response.headers.get('Content-Length') or 0)
+                check = integrity.IntegrityCheck(size, integrity.IntegrityCheck.get_container(output_file)) if Download.verify else None
+
+                # a small body is written with a single call, a larger one than expected is streamed
+                chunks = [response.content] if size <= SmallFileFetcher.max_size else response.iter_content(Download.max_chunk_size)
+                written = 0
+                with open(part_file, 'wb') as file:
+                    for chunk in chunks:
+                        Download.rate_limiter.consume(len(chunk))
+                        file.write(chunk)
+                        written += len(chunk)
+                        if check is not None:
+                            check.update(chunk)
+
+                event["bytes"] = written
+
+            finally:
+                response.close()
+
+        os.replace(part_file, output_file)
+
+        if check is not None:
+            verdict = check.get_verdict()
+            integrity.save_verdict(output_file, verdict)
+            if not verdict["valid"]:
+                message = f"The file at '{output_file}' failed its integrity check: {' '.join(verdict['errors'])}"
+                warnings.warn(message, RuntimeWarning)
+
+    def shutdown(self, wait: bool = True):
+        """Stops accepting files, optionally waiting for the queued ones.
+
+        Parameters:
+        -----------
+        wait : bool, optional
+            If True, blocks until every queued file is fetched (default is True). Otherwise the files that haven't
+            started are dropped.
+        """
+
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class ProgressRenderer():
+    """Draws the progress of the running downloads on the terminal at a bounded frame rate.
+
+    Only running downloads are kept on the area that gets redrawn, one row each plus a row with the total, and a
+    row is only rewritten if its text changed. When a download stops, its last row is printed once above that
+    area, so the cost of a frame depends on the number of running downloads instead of every download ever
+    created. If the output isn't a terminal, only the rows of stopped downloads are printed.
+
+    It can also be used in place of stdout while it's running, in which case whatever is written to it is printed
+    above the redrawn area on the next frame.
+
+    Attributes:
+    -----------
+    download_class : type[Download]
+        The class whose downloads are shown.
+
+    fps : float
+        The maximum number of frames drawn per second.
+
+    stream : TextIO
+        The stream the frames are written to.
+    """
+
+    def __init__(self, download_class: type[Download] = Download, fps: float = 10, stream=None):
+        """Initializes a ProgressRenderer instance.
+
+        Parameters:
+        -----------
+        download_class : type[Download], optional
+            The class whose downloads are shown (default is Download).
+
+        fps : float, optional
+            The maximum number of frames drawn per second (default is 10).
+
+        stream : TextIO | None, optional
+            The stream the frames are written to (default is None, which uses stdout).
+        """
+
+        self.download_class = download_class
+        self.fps = fps
+        self.stream = stream if stream is not None else sys.stdout
+        self._interactive = self.stream.isatty()
+        self._lock = threading.Lock()
+        self._rows = []
+        self._stopped_rows = []
+        self._text = ""
+        self._lines = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _format_time(seconds: float | None):
+        if seconds is None:
+            return "--:--"
+
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+        return f"{minutes:02d}:{seconds:02d}"
+
+    @staticmethod
+    def _format_row(download: Download):
+        file_name: str = download.output_file
+        if '/' in file_name:
+            file_name = file_name.rsplit('/', 1)[1]
+
+        if not download.is_running:
+            if download.progress >= 100:
+                return f"{file_name}: done, {(download.written_bytes/1000000):.2f}mb"
+
+            return f"{file_name}: stopped at {(download.written_bytes/1000000):.2f}mb"
+
+        speed = f"{(download.speed/1000000):.2f}mb/s"
+        if download.total_size:
+            return f"{file_name}: {download.progress:.2f}% of {(download.total_size/1000000):.2f}mb, {speed}, ETA {ProgressRenderer._format_time(download.eta)}"
+
+        return f"{file_name}: {(download.written_bytes/1000000):.2f}mb/?mb, {speed}"
+
+    @staticmethod
+    def _format_total(downloads: list[Download]):
+        written = sum(download.written_bytes for download in downloads)
+        speed = sum(download.speed for download in downloads)
+
+        # the total time left is only known if the size of every file is
+        eta = None
+        if speed and all(download.total_size for download in downloads):
+            eta = sum(max(download.total_size - download.written_bytes, 0) for download in downloads) / speed
+
+        return f"total: {len(downloads)} running, {(written/1000000):.2f}mb, {(speed/1000000):.2f}mb/s, ETA {ProgressRenderer._format_time(eta)}"
+
+    def _on_event(self, event: str, download: Download):
+        if not isinstance(download, self.download_class):
+            return
+
+        with self._lock:
+            if event == 'started' and download not in self._rows:
+                self._rows.append(download)
+
+            elif event == 'finished' and download in self._rows:
+                self._rows.remove(download)
+                self._stopped_rows.append(download)
+
+    def render(self):
+        """Draws a single frame, writing only the rows that changed since the last one.
+
+        Side Effects:
+        -------------
+        Writes the frame to `stream` with a single call.
+        """
+
+        with self._lock:
+            rows = list(self._rows)
+            stopped_rows, self._stopped_rows = self._stopped_rows, []
+
+            # only whole lines of text are printed, the rest waits for the next frame
+            text, _, self._text = self._text.rpartition('\n')
+
+        lines = text.split('\n') if text else []
+        lines += [ProgressRenderer._format_row(download) for download in stopped_rows]
+        if not self._interactive:
+            if lines:
+                self.stream.write(''.join(f"{line}\n" for line in lines))
+                self.stream.flush()
+
+            return
+
+        # the text and the stopped rows go above the redrawn area, pushing it down
+        redrawn = len(lines)
+        if rows:
+            lines += [ProgressRenderer._format_row(download) for download in rows]
+            lines.append(ProgressRenderer._format_total(rows))
+
+        if not redrawn and lines == self._lines:
+            return
+
+        # go back to the first row of the previous frame and skip the rows that are still the same
+        output = [f"\033[{len(self._lines)}F"] if self._lines else []
+        for index, line in enumerate(lines):
+            if index < len(self._lines) and self._lines[index] == line:
+                output.append("\n")
+
+            else:
+                output.append(f"\033[K{line}\n")
+
+        # clear whatever is left of a larger previous frame
+        if len(lines) < len(self._lines):
+            output.append("\033[J")
+
+        self._lines = lines[redrawn:]
+        self.stream.write(''.join(output))
+        self.stream.flush()
+
+    def write(self, text: str):
+        """Queues text to be printed above the redrawn area on the next frame.
+
+        Parameters:
+        -----------
+        text : str
+            The text to be printed.
+
+        Returns:
+        --------
+        int
+            The number of characters queued.
+        """
+
+        with self._lock:
+            self._text += text
+
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def _run(self):
+        while not self._stop.wait(1 / self.fps):
+            self.render()
+
+    def start(self):
+        """Starts drawing frames on a separate thread.
+
+        Side Effects:
+        -------------
+        Subscribes to the events of every download and shows the downloads already running.
+        """
+
+        self._stop.clear()
+        Download.subscribe(self._on_event)
+        for download in list(self.download_class.download_list):
+            if download.is_running:
+                self._on_event('started', download)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops drawing frames, after drawing a last one.
+
+        Side Effects:
+        -------------
+        Unsubscribes from the events of the downloads.
+        """
+
+        Download.unsubscribe(self._on_event)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        # end the text that's left so it's printed on the last frame
+        if self._text:
+            self.write('\n')
+
+        self.render()
+
 
 if __name__ == "__main__":
     download1 = Download(r"https://github.com/NicolasCARPi/example-files/raw/master/example.aac", "example.aac")
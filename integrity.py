@@ -0,0 +1,323 @@
+import hashlib
+import struct
+import time
+import json
+import os
+
+
+# extensions of the files checked as MP4 containers
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.m4a', '.mov')
+
+# the 'moov' box is kept in memory to check the boxes inside it, unless it's larger than this
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+
+class Mp4Structure():
+    """Checks the top-level boxes of an MP4 file as its bytes arrive in order.
+
+    Every box starts with its size and type, so the boxes can be followed without keeping the file in memory.
+    The 'moov' box, which describes the tracks and is small, is also kept to check the sizes of the boxes inside it.
+
+    Attributes:
+    -----------
+    boxes : list[tuple[str, int, int]]
+        The type, offset and size of every top-level box found so far.
+
+    errors : list[str]
+        The problems found so far. Parsing stops at the first broken box.
+    """
+
+    def __init__(self):
+        """Initializes an Mp4Structure instance."""
+
+        self.boxes = []
+        self.errors = []
+        self._position = 0
+        self._box_end = 0
+        self._header = bytearray()
+        self._moov = None
+
+    def update(self, data: bytes | memoryview):
+        """Parses the next bytes of the file.
+
+        Parameters:
+        -----------
+        data : bytes | memoryview
+            The bytes that follow the ones already parsed.
+        """
+
+        view = memoryview(data)
+        index = 0
+        while index < len(view) and not self.errors:
+            # skip the body of the current box, keeping it if it's the 'moov' box
+            if self._position < self._box_end:
+                size = min(len(view) - index, self._box_end - self._position)
+                if self._moov is not None:
+                    self._moov += view[index:index + size]
+
+                index += size
+                self._position += size
+                if self._position == self._box_end and self._moov is not None:
+                    self.errors.extend(Mp4Structure._check_children(self._moov, 'moov'))
+                    self._moov = None
+
+                continue
+
+            # the header is 8 bytes, or 16 when the size doesn't fit on 32 bits
+            needed = 16 if len(self._header) >= 8 and struct.unpack('>I', self._header[:4])[0] == 1 else 8
+            size = min(len(view) - index, needed - len(self._header))
+            self._header += view[index:index + size]
+            index += size
+            self._position += size
+            if len(self._header) == 8 and struct.unpack('>I', self._header[:4])[0] == 1:
+                continue
+
+            if len(self._header) == needed:
+                self._start_box()
+
+    def _start_box(self):
+        header_size = len(self._header)
+        box_start = self._position - header_size
+        box_size, box_type = struct.unpack('>I4s', self._header[:8])
+        if box_size == 1:
+            box_size = struct.unpack('>Q', self._header[8:16])[0]
+
+        self._header = bytearray()
+        box_type = box_type.decode('latin-1')
+
+        # a size of 0 means the box goes until the end of the file
+        if box_size == 0:
+            self.boxes.append((box_type, box_start, None))
+            self._box_end = float('inf')
+            return
+
+        if box_size < header_size or not box_type.isprintable():
+            self.errors.append(f"Invalid box '{box_type}' at offset {box_start} with size {box_size}.")
+            return
+
+        self.boxes.append((box_type, box_start, box_size))
+        self._box_end = box_start + box_size
+        if box_type == 'moov' and box_size <= MAX_MOOV_SIZE:
+            self._moov = bytearray()
+
+    @staticmethod
+    def _check_children(data: bytearray, parent: str):
+        # the boxes inside a container box have to fill it exactly
+        position = 0
+        while position < len(data):
+            if len(data) - position < 8:
+                return [f"The '{parent}' box ends in the middle of a box header."]
+
+            box_size, box_type = struct.unpack('>I4s', data[position:position + 8])
+            header_size = 8
+            if box_size == 1:
+                if len(data) - position < 16:
+                    return [f"The '{parent}' box ends in the middle of a box header."]
+
+                box_size = struct.unpack('>Q', data[position + 8:position + 16])[0]
+                header_size = 16
+
+            elif box_size == 0:
+                box_size = len(data) - position
+
+            if box_size < header_size or position + box_size > len(data):
+                return [f"Invalid box '{box_type.decode('latin-1')}' inside '{parent}' with size {box_size}."]
+
+            position += box_size
+
+        return []
+
+    def finish(self, size: int):
+        """Checks the structure once every byte of the file was parsed.
+
+        Parameters:
+        -----------
+        size : int
+            The size of the file.
+
+        Returns:
+        --------
+        list[str]
+            Every problem found, or an empty list if the structure is consistent.
+        """
+
+        errors = list(self.errors)
+        if errors:
+            return errors
+
+        types = [box_type for box_type, _, _ in self.boxes]
+        if not types or types[0] != 'ftyp':
+            errors.append("The file doesn't start with an 'ftyp' box.")
+
+        if 'moov' not in types:
+            errors.append("The file has no 'moov' box.")
+
+        if self._header or self._box_end not in (size, float('inf')):
+            errors.append(f"The last box ends at offset {self._box_end + len(self._header)}, but the file has {size} bytes.")
+
+        return errors
+
+
+class IntegrityCheck():
+    """Hashes a file and checks its length and structure while it's written, so it doesn't have to be read again.
+
+    The bytes have to be given in order. Bytes that are written ahead of the ones before them, like by the later
+    ranges of a segmented download, are given once the ones before them are complete.
+
+    Attributes:
+    -----------
+    total_size : int
+        The expected size of the file, or 0 if it's unknown.
+
+    container : str | None
+        The container whose structure is checked, 'mp4' or None to only check the length.
+
+    algorithm : str
+        The name of the hash algorithm, as accepted by `hashlib.new()`.
+
+    position : int
+        The number of bytes checked so far.
+
+    read_back : int
+        The number of bytes that had to be read back from the file instead of being checked as they were written.
+    """
+
+    def __init__(self, total_size: int = 0, container: str | None = None, algorithm: str = 'sha256'):
+        """Initializes an IntegrityCheck instance.
+
+        Parameters:
+        -----------
+        total_size : int, optional
+            The expected size of the file (default is 0, which doesn't check the length).
+
+        container : str | None, optional
+            The container whose structure is checked, 'mp4' or None (default is None).
+
+        algorithm : str, optional
+            The name of the hash algorithm (default is 'sha256').
+        """
+
+        self.total_size = total_size
+        self.container = container
+        self.algorithm = algorithm
+        self.position = 0
+        self.read_back = 0
+        self._hash = hashlib.new(algorithm)
+        self._structure = Mp4Structure() if container == 'mp4' else None
+
+    @staticmethod
+    def get_container(file_path: str):
+        """Gets the container of a file from its extension.
+
+        Parameters:
+        -----------
+        file_path : str
+            The path to the file.
+
+        Returns:
+        --------
+        str | None
+            'mp4' for MP4 files, or None for files whose structure isn't checked, like subtitles.
+        """
+
+        if os.path.splitext(file_path)[1].lower() in MP4_EXTENSIONS:
+            return 'mp4'
+
+        return None
+
+    def update(self, data: bytes | memoryview):
+        """Checks the next bytes of the file.
+
+        Parameters:
+        -----------
+        data : bytes | memoryview
+            The bytes that follow the ones already checked.
+        """
+
+        self._hash.update(data)
+        if self._structure is not None:
+            self._structure.update(data)
+
+        self.position += len(data)
+
+    def get_verdict(self):
+        """Gets the result of the check, once every byte of the file was given.
+
+        Returns:
+        --------
+        dict
+            The size and digest of the file, whether it's valid and the problems found.
+        """
+
+        errors = []
+        if self.total_size and self.position != self.total_size:
+            errors.append(f"Expected {self.total_size} bytes, but the file has {self.position}.")
+
+        if self._structure is not None:
+            errors.extend(self._structure.finish(self.position))
+
+        return {
+            "size": self.position,
+            "algorithm": self.algorithm,
+            "digest": self._hash.hexdigest(),
+            "container": self.container,
+            "valid": not errors,
+            "errors": errors,
+            "checked-at": int(time.time())
+        }
+
+
+def get_verdict_path(file_path: str):
+    # the verdict is kept next to the file it describes
+    return f"{file_path}.check.json"
+
+def load_verdict(file_path: str):
+    """Loads the verdict saved for a file by a previous check.
+
+    Parameters:
+    -----------
+    file_path : str
+        The path to the checked file.
+
+    Returns:
+    --------
+    dict | None
+        The verdict, or None if the file was never checked or the verdict doesn't match its current size.
+    """
+
+    path = get_verdict_path(file_path)
+    if not os.path.exists(path) or not os.path.exists(file_path):
+        return None
+
+    try:
+        with open(path, 'r') as file:
+            verdict = json.load(file)
+
+    except (OSError, ValueError):
+        return None
+
+    # a file replaced after it was checked isn't described by the verdict anymore
+    if verdict.get("size") != os.path.getsize(file_path):
+        return None
+
+    return verdict
+
+def save_verdict(file_path: str, verdict: dict):
+    """Saves the verdict of a check next to the checked file.
+
+    Parameters:
+    -----------
+    file_path : str
+        The path to the checked file.
+
+    verdict : dict
+        The verdict returned by `IntegrityCheck.get_verdict()`.
+    """
+
+    path = get_verdict_path(file_path)
+
+    # write to a temporary file first so a crash never leaves a half written verdict
+    with open(f"{path}.tmp", 'w') as file:
+        json.dump(verdict, file, indent=4)
+
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,202 @@
+import contextlib
+import threading
+import tempfile
+import time
+import json
+import os
+
+
+# seconds after which the lock file of a process that crashed while saving is taken over
+STALE_LOCK = 10
+
+
+class LinkCache():
+    """A persistent cache of resolved links that expire after a given time.
+
+    Entries are stored on a json file as `{key: [value, timestamp]}` and saved after every change, so links
+    resolved by a run that's interrupted can still be reused by the next one. Processes can share the same file,
+    since every save is merged with the entries saved by the others while holding a lock file.
+
+    Attributes:
+    -----------
+    path : str
+        The path to the json file where the cache is stored.
+
+    ttl : float
+        The number of seconds an entry stays valid. A ttl of 0 disables the cache.
+
+    max_entries : int
+        The maximum number of entries kept. The oldest entries are evicted first.
+    """
+
+    def __init__(self, path: str = "output/link_cache.json", ttl: float = 6 * 3600, max_entries: int = 10000):
+        """Initializes a LinkCache instance, loading the entries saved on `path`.
+
+        Parameters:
+        -----------
+        path : str, optional
+            The path to the json file where the cache is stored (default is 'output/link_cache.json').
+
+        ttl : float, optional
+            The number of seconds an entry stays valid (default is 6 hours). A ttl of 0 disables the cache.
+
+        max_entries : int, optional
+            The maximum number of entries kept (default is 10000).
+        """
+
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._removed = {}
+        self._synced = 0
+
+        if ttl and os.path.exists(path):
+            with open(path, 'r') as file:
+                self._entries = json.load(file)
+
+            self._synced = time.time()
+            self._evict()
+
+    def _evict(self):
+        # drop expired entries, then the oldest ones if there's still too many
+        now = time.time()
+        self._entries = {key: entry for key, entry in self._entries.items() if now - entry[1] < self.ttl}
+
+        if len(self._entries) > self.max_entries:
+            oldest_first = sorted(self._entries.items(), key=lambda item: item[1][1])
+            self._entries = dict(oldest_first[-self.max_entries:])
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        # 'O_EXCL' makes creating the lock file fail while another process holds it, on every system
+        lock_path = f"{self.path}.lock"
+        while True:
+            try:
+                descriptor = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > STALE_LOCK:
+                        os.remove(lock_path)
+
+                # the lock was released in the meantime
+                except OSError:
+                    pass
+
+                time.sleep(0.01)
+
+        try:
+            yield
+
+        finally:
+            os.close(descriptor)
+            os.remove(lock_path)
+
+    def _merge(self):
+        # entries saved by other processes are kept unless this one has a newer version or removed them since
+        try:
+            with open(self.path, 'r') as file:
+                saved = json.load(file)
+
+        except (OSError, ValueError):
+            return
+
+        # and entries that were already saved but are gone from the file were removed by another process
+        for key in [key for key, entry in self._entries.items() if key not in saved and entry[1] <= self._synced]:
+            del self._entries[key]
+
+        for key, entry in saved.items():
+            if entry[1] <= self._removed.get(key, 0):
+                continue
+
+            if key not in self._entries or self._entries[key][1] < entry[1]:
+                self._entries[key] = entry
+
+        self._evict()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        with self._file_lock():
+            self._merge()
+
+            # write to a temporary file of its own first so a crash or another process never leaves a half
+            # written cache
+            descriptor, temp_path = tempfile.mkstemp(suffix='.tmp', prefix=f"{os.path.basename(self.path)}.", dir=directory or '.')
+            try:
+                with os.fdopen(descriptor, 'w') as file:
+                    json.dump(self._entries, file)
+
+                os.replace(temp_path, self.path)
+                self._synced = time.time()
+
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+    def get(self, key: str):
+        """Gets the value of an entry if it hasn't expired.
+
+        Parameters:
+        -----------
+        key : str
+            The key of the entry.
+
+        Returns:
+        --------
+        Any | None
+            The cached value, or None if there's no valid entry for the key.
+        """
+
+        if not self.ttl:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if time.time() - entry[1] >= self.ttl:
+                del self._entries[key]
+                return None
+
+            return entry[0]
+
+    def set(self, key: str, value):
+        """Stores a value and saves the cache.
+
+        Parameters:
+        -----------
+        key : str
+            The key of the entry.
+
+        value : Any
+            The value to store. Must be serializable to json.
+        """
+
+        if not self.ttl:
+            return
+
+        with self._lock:
+            self._entries[key] = [value, time.time()]
+            self._evict()
+            self._save()
+
+    def invalidate(self, key: str):
+        """Removes an entry, such as a direct link the server doesn't accept anymore.
+
+        Parameters:
+        -----------
+        key : str
+            The key of the entry.
+        """
+
+        with self._lock:
+            self._removed[key] = time.time()
+            if self._entries.pop(key, None) is not None:
+                self._save()
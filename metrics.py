@@ -0,0 +1,207 @@
+import contextlib
+import threading
+import time
+import json
+import os
+
+
+class Metrics():
+    """Collects the duration and the counters of every phase of a run, like starting the browser, requesting a link
+    or transferring a file, and exports them.
+
+    Every recorded event is aggregated per phase and, if a json-lines file is open, appended to it right away,
+    so the events of a run that's interrupted are kept. The aggregates can be written as a Prometheus textfile.
+
+    Attributes:
+    -----------
+    jsonl_path : str | None
+        The path to the json-lines file where every event is appended, or None to not write them.
+
+    prometheus_path : str | None
+        The path to the Prometheus textfile written by `write_prometheus()`, or None to not write it.
+    """
+
+    def __init__(self, jsonl_path: str | None = None, prometheus_path: str | None = None):
+        """Initializes a Metrics instance.
+
+        Parameters:
+        -----------
+        jsonl_path : str | None, optional
+            The path to the json-lines file where every event is appended (default is None).
+
+        prometheus_path : str | None, optional
+            The path to the Prometheus textfile written by `write_prometheus()` (default is None).
+        """
+
+        self.jsonl_path = None
+        self.prometheus_path = None
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._file = None
+        self.open(jsonl_path, prometheus_path)
+
+    def open(self, jsonl_path: str | None = None, prometheus_path: str | None = None):
+        """Sets the files the metrics are exported to.
+
+        Parameters:
+        -----------
+        jsonl_path : str | None, optional
+            The path to the json-lines file where every event is appended (default is None).
+
+        prometheus_path : str | None, optional
+            The path to the Prometheus textfile written by `write_prometheus()` (default is None).
+        """
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+            self.jsonl_path = jsonl_path
+            self.prometheus_path = prometheus_path
+
+            if jsonl_path is not None:
+                directory = os.path.dirname(jsonl_path)
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory)
+
+                self._file = open(jsonl_path, 'a', buffering=1)
+
+    def record(self, phase: str, seconds: float | None = None, **fields):
+        """Records an event of a phase.
+
+        Parameters:
+        -----------
+        phase : str
+            The name of the phase, like 'request_download_data' or 'transfer'.
+
+        seconds : float | None, optional
+            The duration of the event (default is None, for events that are only counted).
+
+        **fields
+            Other values of the event. 'bytes', 'retries' and 'stalls' are added up on the aggregates, and
+            'error' counts the event as failed.
+        """
+
+        with self._lock:
+            aggregate = self._phases.setdefault(phase, {
+                "count": 0,
+                "errors": 0,
+                "seconds": 0,
+                "max-seconds": 0,
+                "bytes": 0,
+                "retries": 0,
+                "stalls": 0
+            })
+            aggregate["count"] += 1
+            if fields.get("error") is not None:
+                aggregate["errors"] += 1
+
+            if seconds is not None:
+                aggregate["seconds"] += seconds
+                aggregate["max-seconds"] = max(aggregate["max-seconds"], seconds)
+
+            for key in ("bytes", "retries", "stalls"):
+                aggregate[key] += fields.get(key) or 0
+
+            if self._file is not None:
+                event = {"time": round(time.time(), 3), "phase": phase}
+                if seconds is not None:
+                    event["seconds"] = round(seconds, 6)
+
+                event.update(fields)
+                self._file.write(f"{json.dumps(event)}\n")
+
+    @contextlib.contextmanager
+    def timed(self, phase: str, **fields):
+        """Measures the duration of a block or, when used as a decorator, of every call to a function.
+
+        The block can add values to the event through the yielded dictionary. If it raises, the name of the
+        exception is recorded as the 'error' of the event.
+
+        Parameters:
+        -----------
+        phase : str
+            The name of the phase.
+
+        **fields
+            Other values of the event.
+
+        Yields:
+        -------
+        dict
+            The values of the event.
+        """
+
+        began = time.perf_counter()
+        try:
+            yield fields
+
+        except BaseException as error:
+            fields["error"] = type(error).__name__
+            raise
+
+        finally:
+            self.record(phase, time.perf_counter() - began, **fields)
+
+    def summary(self):
+        """Gets the aggregates of every phase.
+
+        Returns:
+        --------
+        dict[str, dict]
+            The count, errors, total and maximum seconds, bytes, retries and stalls of every phase.
+        """
+
+        with self._lock:
+            return {phase: aggregate.copy() for phase, aggregate in self._phases.items()}
+
+    def write_prometheus(self, path: str | None = None):
+        """Writes the aggregates of every phase as a Prometheus textfile.
+
+        Parameters:
+        -----------
+        path : str | None, optional
+            The path to the textfile (default is None, which uses `prometheus_path`).
+        """
+
+        path = path or self.prometheus_path
+        if path is None:
+            return
+
+        metrics = [
+            ("vizer_phase_total", "counter", "Number of times each phase ran.", "count"),
+            ("vizer_phase_errors_total", "counter", "Number of times each phase failed.", "errors"),
+            ("vizer_phase_seconds_total", "counter", "Total seconds spent on each phase.", "seconds"),
+            ("vizer_phase_seconds_max", "gauge", "Longest run of each phase in seconds.", "max-seconds"),
+            ("vizer_phase_bytes_total", "counter", "Bytes transferred on each phase.", "bytes"),
+            ("vizer_phase_retries_total", "counter", "Retries on each phase.", "retries"),
+            ("vizer_phase_stalls_total", "counter", "Stalls on each phase.", "stalls"),
+        ]
+
+        summary = self.summary()
+        lines = []
+        for name, kind, description, key in metrics:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for phase, aggregate in sorted(summary.items()):
+                lines.append(f"{name}{{phase=\"{phase}\"}} {round(aggregate[key], 6)}")
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # the collector may read the file at any time, so it's replaced at once
+        with open(f"{path}.tmp", 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+
+        os.replace(f"{path}.tmp", path)
+
+    def close(self):
+        """Writes the Prometheus textfile, if there's one, and closes the json-lines file."""
+
+        self.write_prometheus()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
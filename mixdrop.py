@@ -0,0 +1,134 @@
+import re
+
+import requests
+
+
+# mixdrop pages hide the video url inside a script packed with 'eval(function(p,a,c,k,e,d){...})'
+PACKED_SCRIPT = re.compile(r"}\('(.*?)',\s*(\d+),\s*(\d+),\s*'(.*?)'\.split\('\|'\)", re.DOTALL)
+PACKED_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# places where the direct link can show up once the page is unpacked
+LINK_PATTERNS = [
+    re.compile(r'MDCore\.wurl\s*=\s*"([^"]+)"'),
+    re.compile(r'<a[^>]+class="[^"]*download-btn[^"]*"[^>]+href="([^"#]+)"'),
+    re.compile(r'<a[^>]+href="([^"#]+)"[^>]+class="[^"]*download-btn[^"]*"'),
+]
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36'
+
+
+def _decode_word(word: str, radix: int):
+    value = 0
+    for digit in word:
+        index = PACKED_DIGITS.find(digit)
+        if index < 0 or index >= radix:
+            return None
+
+        value = value * radix + index
+
+    return value
+
+def unpack_scripts(html: str):
+    """Unpacks every script packed with 'eval(function(p,a,c,k,e,d){...})' on a page.
+
+    Parameters:
+    -----------
+    html : str
+        The markup of the page.
+
+    Returns:
+    --------
+    list[str]
+        The source of every unpacked script.
+    """
+
+    scripts = []
+    for match in PACKED_SCRIPT.finditer(html):
+        payload, radix, count, symbols = match.groups()
+        radix = int(radix)
+        symbols = symbols.split('|')
+        payload = payload.replace("\\'", "'").replace("\\\\", "\\")
+
+        # every word on the payload is an index on the symbol table, written in base 'radix'
+        def replace(word_match: re.Match):
+            word = word_match.group(0)
+            index = _decode_word(word, radix)
+            if index is None or index >= len(symbols) or not symbols[index]:
+                return word
+
+            return symbols[index]
+
+        scripts.append(re.sub(r"\b\w+\b", replace, payload))
+
+    return scripts
+
+def find_download_link(html: str):
+    """Searches the markup and the packed scripts of a mixdrop page for the direct link to the file.
+
+    Parameters:
+    -----------
+    html : str
+        The markup of the page.
+
+    Returns:
+    --------
+    str | None
+        The direct link, or None if it isn't on the page.
+    """
+
+    for source in [html, *unpack_scripts(html)]:
+        for pattern in LINK_PATTERNS:
+            match = pattern.search(source)
+            if match:
+                link = match.group(1)
+
+                # links are usually protocol relative
+                if link.startswith("//"):
+                    link = f"https:{link}"
+
+                if link.startswith("http"):
+                    return link
+
+    return None
+
+def get_download_link(url: str, session: requests.Session | None = None):
+    """Gets the direct link to a file hosted on mixdrop using only HTTP requests.
+
+    The download page is tried first and the embed page, which always has the packed player script, second.
+
+    Parameters:
+    -----------
+    url : str
+        The url to the mixdrop page, like the ones found on the season json.
+
+    session : requests.Session | None, optional
+        The session used for the requests (default is None, which uses a new one).
+
+    Returns:
+    --------
+    str | None
+        The direct link, or None if it could not be extracted, in which case the browser should be used.
+    """
+
+    if session is None:
+        session = requests.Session()
+
+    # '/f/<id>' is the download page and '/e/<id>' is the embed page
+    page_url = url.split('?', 1)[0]
+    candidates = [url, re.sub(r"/f/", "/e/", page_url, count=1)]
+
+    for candidate in candidates:
+        try:
+            response = session.get(candidate, headers={"User-Agent": USER_AGENT, "Referer": page_url}, timeout=15)
+
+        except requests.RequestException:
+            continue
+
+        if response.status_code != 200:
+            continue
+
+        link = find_download_link(response.text)
+        if link is not None:
+            return link
+
+    return None
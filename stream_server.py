@@ -0,0 +1,158 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import quote
+import mimetypes
+import threading
+import re
+import os
+
+from downloader import Download
+
+
+# the size of the reads sent to the player at once
+READ_SIZE = 256 * 1024
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """Serves the file of a streaming download on any path, with support for 'Range' requests so players can seek.
+
+    Bytes that aren't downloaded yet are waited for instead of failing the request, and the position requested
+    by the player becomes the playhead of the download.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body: bool):
+        download: Download = self.server.download
+        size = download.total_size
+        content_type = mimetypes.guess_type(download.output_file)[0] or 'application/octet-stream'
+        start, end = 0, size - 1
+        status = 200
+
+        # ranges need the size of the file, the rest of a stream with an unknown size is only sent in order
+        range_header = self.headers.get('Range')
+        if range_header and size:
+            match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+            if match is None or not any(match.groups()):
+                self.send_error(416)
+                return
+
+            # 'bytes=-<n>' asks for the last n bytes, which players use to find the index of MP4 files
+            if not match.group(1):
+                start = max(size - int(match.group(2)), 0)
+
+            else:
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), size - 1)
+
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if size:
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(end - start + 1))
+
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+
+        self.end_headers()
+
+        if send_body:
+            self._send_body(download, start, end if size else None)
+
+    def _send_body(self, download: Download, start: int, end: int | None):
+        position = start
+        try:
+            while end is None or position <= end:
+                size = READ_SIZE if end is None else min(READ_SIZE, end + 1 - position)
+                data = download.read_at(position, size)
+
+                # the download stopped or failed before the bytes arrived, so the response can't be completed
+                if not data:
+                    self.close_connection = True
+                    break
+
+                self.wfile.write(data)
+                position += len(data)
+
+            self.wfile.flush()
+
+        # players drop connections all the time, like when they seek
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            self.close_connection = True
+
+
+class StreamServer(ThreadingHTTPServer):
+    """A local HTTP server that lets a player open a download while it's running.
+
+    Attributes:
+    -----------
+    download : Download
+        The download being served, created with `streaming=True`.
+
+    url : str
+        The address to open on the player.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, download: Download, host: str = '127.0.0.1', port: int = 0):
+        """Initializes a StreamServer instance, listening right away.
+
+        Parameters:
+        -----------
+        download : Download
+            The download to serve.
+
+        host : str, optional
+            The address to listen on (default is '127.0.0.1', which only accepts players on this machine).
+
+        port : int, optional
+            The port to listen on (default is 0, which picks a free one).
+        """
+
+        super().__init__((host, port), StreamHandler)
+        self.download = download
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{quote(os.path.basename(self.download.output_file))}"
+
+    def start(self):
+        """Starts serving requests on a background thread."""
+
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops serving requests and closes the listening socket."""
+
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self.server_close()
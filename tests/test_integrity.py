@@ -0,0 +1,99 @@
+import sys
+import os
+import hashlib
+import struct
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from integrity import IntegrityCheck
+
+
+def box(box_type: str, payload: bytes = b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type.encode()) + payload
+
+def large_box(box_type: str, payload: bytes = b''):
+    # a size of 1 means the real size follows the type on 64 bits
+    return struct.pack('>I4sQ', 1, box_type.encode(), 16 + len(payload)) + payload
+
+def make_mp4(mdat: bytes | None = None):
+    moov = box('moov', box('mvhd', bytes(100)) + box('trak', box('tkhd', bytes(84))))
+    return box('ftyp', b'isom' + bytes(4) + b'isommp41') + moov + (mdat or box('mdat', bytes(1000)))
+
+def check(data: bytes, chunk_size: int | None = None, total_size: int | None = None):
+    integrity = IntegrityCheck(len(data) if total_size is None else total_size, 'mp4')
+    chunk_size = chunk_size or len(data)
+    for start in range(0, len(data), chunk_size):
+        integrity.update(data[start:start + chunk_size])
+
+    return integrity.get_verdict()
+
+def test_valid_file():
+    data = make_mp4()
+    verdict = check(data)
+
+    assert verdict["valid"]
+    assert verdict["errors"] == []
+    assert verdict["size"] == len(data)
+    assert verdict["digest"] == hashlib.sha256(data).hexdigest()
+
+def test_valid_file_in_small_chunks():
+    # the box headers are split across the chunks
+    assert check(make_mp4(), chunk_size=3)["valid"]
+    assert check(make_mp4(), chunk_size=1)["valid"]
+
+def test_64_bit_box_size():
+    data = make_mp4(large_box('mdat', bytes(1000)))
+    integrity = IntegrityCheck(len(data), 'mp4')
+    for start in range(0, len(data), 5):
+        integrity.update(data[start:start + 5])
+
+    assert integrity.get_verdict()["valid"]
+    assert integrity._structure.boxes[-1] == ('mdat', len(data) - 1016, 1016)
+
+def test_64_bit_box_size_inside_moov():
+    moov = box('moov', box('mvhd', bytes(100)) + large_box('trak', bytes(20)))
+    data = box('ftyp', b'isom' + bytes(4)) + moov + box('mdat', bytes(10))
+
+    assert check(data)["valid"]
+
+def test_truncated_file():
+    data = make_mp4()[:-100]
+    verdict = check(data, total_size=len(data) + 100)
+
+    assert not verdict["valid"]
+    assert f"Expected {len(data) + 100} bytes, but the file has {len(data)}." in verdict["errors"]
+    assert f"The last box ends at offset {len(data) + 100}, but the file has {len(data)} bytes." in verdict["errors"]
+
+def test_truncated_box_header():
+    # the file ends 3 bytes into the header of another box
+    data = make_mp4() + bytes(3)
+    verdict = check(data)
+
+    assert not verdict["valid"]
+    assert verdict["errors"] == [f"The last box ends at offset {len(data)}, but the file has {len(data)} bytes."]
+
+def test_broken_moov_child():
+    # the 'trak' box claims more bytes than the 'moov' box has left
+    trak = struct.pack('>I4s', 500, b'trak') + bytes(20)
+    moov = box('moov', box('mvhd', bytes(100)) + trak)
+    data = box('ftyp', b'isom' + bytes(4)) + moov + box('mdat', bytes(10))
+    verdict = check(data)
+
+    assert not verdict["valid"]
+    assert verdict["errors"] == ["Invalid box 'trak' inside 'moov' with size 500."]
+
+def test_invalid_top_level_box():
+    data = make_mp4() + struct.pack('>I4s', 4, b'free')
+    verdict = check(data)
+
+    assert not verdict["valid"]
+    assert verdict["errors"] == [f"Invalid box 'free' at offset {len(data) - 8} with size 4."]
+
+def test_missing_boxes():
+    verdict = check(box('mdat', bytes(10)))
+
+    assert verdict["errors"] == ["The file doesn't start with an 'ftyp' box.", "The file has no 'moov' box."]
+
+def test_get_container():
+    assert IntegrityCheck.get_container("S01E01.MP4") == 'mp4'
+    assert IntegrityCheck.get_container("S01E01.srt") is None
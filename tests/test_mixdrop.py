@@ -0,0 +1,42 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mixdrop
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name: str):
+    with open(os.path.join(FIXTURES, name), 'r') as file:
+        return file.read()
+
+def test_unpack_scripts_packed_page():
+    scripts = mixdrop.unpack_scripts(read_fixture("mixdrop_packed.html"))
+
+    assert len(scripts) == 1
+    assert 'MDCore.ref="7kq9x2vdbn1o3"' in scripts[0]
+    assert 'MDCore.wurl="//s-delivery41.mxdcontent.net/v/9f2c4e1b7a6d8c3e.mp4?s=hR4pQw2N_xVb8kLm&e=1697500000&_t=1697480000"' in scripts[0]
+
+def test_unpack_scripts_without_packed_scripts():
+    assert mixdrop.unpack_scripts(read_fixture("mixdrop_download_button.html")) == []
+
+def test_find_download_link_packed_page():
+    link = mixdrop.find_download_link(read_fixture("mixdrop_packed.html"))
+
+    # the link only shows up once the script is unpacked, and it's protocol relative
+    assert link == "https://s-delivery41.mxdcontent.net/v/9f2c4e1b7a6d8c3e.mp4?s=hR4pQw2N_xVb8kLm&e=1697500000&_t=1697480000"
+
+def test_find_download_link_download_button():
+    link = mixdrop.find_download_link(read_fixture("mixdrop_download_button.html"))
+
+    assert link == "https://s-delivery27.mxdcontent.net/download/3b8e1f0c5d7a.mp4?s=Lk2mN9pQ_r4tUv1w&e=1697500000&_t=1697480000"
+
+def test_find_download_link_no_link():
+    html = read_fixture("mixdrop_no_link.html")
+
+    # the page still has a download button and a packed script, just without a link on them
+    assert mixdrop.unpack_scripts(html) == ['MDCore.ref="removed";']
+    assert mixdrop.find_download_link(html) is None
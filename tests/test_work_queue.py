@@ -0,0 +1,129 @@
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from work_queue import WorkQueue
+
+
+def open_queue(tmp_path, worker_id: str, **kwargs):
+    return WorkQueue(str(tmp_path / "work_queue.db"), worker_id=worker_id, **kwargs)
+
+def test_add_ignores_duplicate_keys(tmp_path):
+    queue = open_queue(tmp_path, "a")
+
+    assert queue.add("S1E1", {"url": "one"})
+    assert not queue.add("S1E1", {"url": "other"})
+    assert queue.counts() == {"pending": 1, "leased": 0, "done": 0, "failed": 0}
+    queue.close()
+
+def test_claim_leases_task_to_one_worker(tmp_path):
+    first = open_queue(tmp_path, "a")
+    second = open_queue(tmp_path, "b")
+    first.add("S1E1", {"url": "one"})
+
+    assert first.claim() == ("S1E1", {"url": "one"})
+    # the lease hasn't expired, so there's nothing left for the other worker
+    assert second.claim() is None
+
+    # only the worker holding the lease can complete the task
+    assert not second.complete("S1E1")
+    assert first.complete("S1E1")
+    assert first.counts()["done"] == 1
+
+    first.close()
+    second.close()
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    first = open_queue(tmp_path, "a", lease_time=0.2)
+    second = open_queue(tmp_path, "b", lease_time=0.2)
+    first.add("S1E1", {"url": "one"})
+    assert first.claim() is not None
+
+    # a crashed worker stops renewing its leases
+    first._closed.set()
+    time.sleep(0.3)
+
+    assert second.claim() == ("S1E1", {"url": "one"})
+    assert not first.renew("S1E1")
+    assert not first.complete("S1E1")
+    assert second.complete("S1E1")
+
+    first.close()
+    second.close()
+
+def test_heartbeat_keeps_lease(tmp_path):
+    lost = []
+    first = open_queue(tmp_path, "a", lease_time=0.3, on_lost=lost.append)
+    second = open_queue(tmp_path, "b", lease_time=0.3)
+    first.add("S1E1", {"url": "one"})
+    assert first.claim() is not None
+
+    time.sleep(0.6)
+    assert second.claim() is None
+    assert lost == []
+
+    first.close()
+    second.close()
+
+def test_lost_lease_is_reported(tmp_path):
+    lost = []
+    first = open_queue(tmp_path, "a", lease_time=0.3, on_lost=lost.append)
+    second = open_queue(tmp_path, "b", lease_time=0.3)
+    first.add("S1E1", {"url": "one"})
+    assert first.claim() is not None
+
+    # another worker takes the task over, like after a pause longer than the lease
+    second._connection.execute("UPDATE tasks SET worker = 'b'")
+    time.sleep(0.3)
+
+    assert lost == ["S1E1"]
+    assert first.lost_leases() == {"S1E1"}
+    assert first.lost_leases() == set()
+
+    first.close()
+    second.close()
+
+def test_failed_task_gives_up_after_max_attempts(tmp_path):
+    queue = open_queue(tmp_path, "a", max_attempts=2)
+    queue.add("S1E1", {"url": "one"})
+
+    assert queue.claim() is not None
+    queue.release("S1E1", failed=True)
+    assert queue.counts()["pending"] == 1
+
+    assert queue.claim() is not None
+    queue.release("S1E1", failed=True)
+    assert queue.counts()["failed"] == 1
+    assert queue.claim() is None
+
+    queue.close()
+
+def test_release_without_failing_keeps_attempts(tmp_path):
+    queue = open_queue(tmp_path, "a", max_attempts=1)
+    queue.add("S1E1", {"url": "one"})
+
+    # a worker that stops gives the task back without using up its attempt
+    for _ in range(3):
+        assert queue.claim() is not None
+        queue.release("S1E1")
+
+    assert queue.counts()["pending"] == 1
+    queue.close()
+
+def test_expired_lease_counts_as_attempt(tmp_path):
+    first = open_queue(tmp_path, "a", lease_time=0.2, max_attempts=1)
+    second = open_queue(tmp_path, "b", lease_time=0.2, max_attempts=1)
+    first.add("S1E1", {"url": "one"})
+    assert first.claim() is not None
+
+    first._closed.set()
+    time.sleep(0.3)
+
+    # the task already used its only attempt, so it's given up on instead of reclaimed
+    assert second.claim() is None
+    assert second.counts()["failed"] == 1
+
+    first.close()
+    second.close()
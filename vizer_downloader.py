@@ -1,35 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+from collections import deque
+import contextlib
 import threading
+import functools
 import warnings
 import argparse
 import random
+import shutil
 import time
 import json
+import sys
 import re
 import os
 
 import requests
-from bs4 import BeautifulSoup
-import undetected_chromedriver as uc
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.options import Options
 
-from downloader import Download
+from downloader import Download, DownloadManager, DiskWriter, ProgressRenderer, RateLimiter, SmallFileFetcher
+from stream_server import StreamServer, READ_SIZE
+from link_cache import LinkCache
+from work_queue import WorkQueue
+import integrity
+import mixdrop
 
+# only imported for the annotations, the functions that drive the browser import selenium when they're called
+if TYPE_CHECKING:
+    from selenium import webdriver
+    import undetected_chromedriver as uc
 
-# rewrites the __del__ method to fix an oversight that throws an unnecessary warning every time Crhome.quit() is called
-class FixedChrome(uc.Chrome):
-    def __del__(self):
-        try:
-            self.quit()
-        except: #noqa
-            pass
 
-def start_browser():
+# shared session so requests to the same host reuse their connections
+session = requests.Session()
+session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=32))
+
+# the key on the season json and the extension of the file for each option of '--key'
+DOWNLOAD_KEYS = {
+    'dub': ('dubbed-audio', '.mp4'),
+    'eng': ('original-audio', '.mp4'),
+    'sub': ('subtitles', '.srt')
+}
+
+# timings of every phase, shared with the downloads so they're all exported together
+metrics = Download.metrics
+
+# endpoint the site uses to load its data without reloading the page
+AJAX_URL = r"https://vizertv.in/includes/ajax/publicFunctions.php"
+
+# maximum number of concurrent requests to a single host, to avoid getting blocked
+max_requests_per_host = 4
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+def host_slot(url: str):
+    # one semaphore per host, created the first time the host is requested
+    host = urlsplit(url).netloc
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(max_requests_per_host)
+
+        return _host_slots[host]
+
+def wait_for_element(browser: 'webdriver.Chrome', by: str, value: str, timeout: float = 15):
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    return WebDriverWait(browser, timeout, poll_frequency=0.1).until(EC.presence_of_element_located((by, value)))
+
+def extension_loaded(browser: 'webdriver.Chrome'):
+    # the extension is ready once its background page or service worker is running
+    targets = browser.execute_cdp_cmd('Target.getTargets', {})["targetInfos"]
+    for target in targets:
+        if target["url"].startswith("chrome-extension://") and target["type"] in ("background_page", "service_worker"):
+            return True
+
+    return False
+
+@functools.cache
+def chrome_classes():
+    # the classes extend the ones from selenium and undetected_chromedriver, so they're only built once those are
+    # imported, the first time a browser is started
+    import undetected_chromedriver as uc
+    from selenium import webdriver
+
+    # rewrites the __del__ method to fix an oversight that throws an unnecessary warning every time Crhome.quit() is called
+    class FixedChrome(uc.Chrome):
+        def __del__(self):
+            try:
+                self.quit()
+            except: #noqa
+                pass
+
+    # rewrites quit so that attaching to a browser that's shared with other runs only closes the tab that was opened
+    class AttachedChrome(webdriver.Chrome):
+        def quit(self):
+            try:
+                self.close()
+            except: #noqa
+                pass
+
+            super().quit()
+
+    return FixedChrome, AttachedChrome
+
+@metrics.timed('start_browser')
+def start_browser(browser_address: str | None = None):
+    # selenium and undetected_chromedriver are slow to import, so runs that never need a browser don't load them
+    import undetected_chromedriver as uc
+    from selenium import webdriver
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+
+    FixedChrome, AttachedChrome = chrome_classes()
+
     try:
-        print("Starting browser...")
         browser = None
 
+        # set custom user agent
+        user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36'
+
+        # attach to a browser that's already running, on a tab of its own
+        if browser_address is not None:
+            print(f"Attaching to browser at {browser_address}...")
+            options = webdriver.ChromeOptions()
+            options.debugger_address = browser_address
+            browser = AttachedChrome(options=options)
+            browser.switch_to.new_window('tab')
+            browser.execute_cdp_cmd('Network.setUserAgentOverride', {'userAgent': user_agent})
+
+            print("Browser attached.")
+            return browser
+
+        print("Starting browser...")
+
         # set options
         options = uc.ChromeOptions()
         options.add_argument("--headless")
@@ -39,20 +142,24 @@ def start_browser():
 
         # load uBlock
         extension_dir = os.path.join(os.getcwd(), "uBlock")
-        options.add_argument(f"--load-extension={extension_dir}")
+        if os.path.isdir(extension_dir):
+            options.add_argument(f"--load-extension={extension_dir}")
 
         # start browser
         browser = FixedChrome(options=options)
         browser.set_window_size(800, 600)
-        browser.implicitly_wait(15)
         browser.minimize_window()
 
-        # set custom user agent
-        user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36'
         browser.execute_cdp_cmd('Network.setUserAgentOverride', {'userAgent': user_agent})
 
         # wait for uBlock to load
-        time.sleep(5)
+        if os.path.isdir(extension_dir):
+            try:
+                WebDriverWait(browser, 10, poll_frequency=0.1).until(extension_loaded)
+
+            except TimeoutException:
+                message = "uBlock did not load in time, ads might get in the way."
+                warnings.warn(message, RuntimeWarning)
 
         print("Browser started.")
         return browser
@@ -62,11 +169,304 @@ def start_browser():
         if browser is not None:
             browser.quit()
 
+def enqueue_season(queue_path: str, json_path: str, output_path: str, download_key: str, extension: str, start_from: int = 0, stop_at: int | None = None):
+    # read json data
+    with open(json_path, 'r') as file:
+        season_dict = json.load(file)
+
+    # every episode in range becomes a task that any worker can claim, adding the same season again is harmless
+    work_queue = WorkQueue(queue_path)
+    added = 0
+    for episode in season_dict["episodes"]:
+        if int(episode["episode-number"]) < start_from:
+            continue
+
+        elif stop_at is not None and int(episode["episode-number"]) > stop_at:
+            break
+
+        key = f"{season_dict["series-name"]}/{season_dict["season-number"]}/{episode["episode-number"]}/{download_key}"
+        payload = {
+            "series-name": season_dict["series-name"],
+            "season-number": season_dict["season-number"],
+            "episode": episode,
+            "download-key": download_key,
+            "extension": extension,
+            "output": output_path
+        }
+        added += work_queue.add(key, payload)
+
+    counts = work_queue.counts()
+    work_queue.close()
+    print(f"Added {added} episodes to '{queue_path}' ({counts["pending"]} pending, {counts["leased"]} running, {counts["done"]} done, {counts["failed"]} failed).")
+
+def run_worker(queue_path: str, max_downloads: int = 3, segments: int = 1, engine: str = 'threads', rate_limit: float | None = None, per_download_limit: float | None = None, cache_ttl: float = 6 * 3600, browsers: int = 1, browser_address: str | None = None, fsync: str = 'complete', lease_time: float = 300, poll_interval: float = 10):
+    # choose the download engine
+    download_class = get_download_class(engine, max_downloads)
+
+    # the limits and the cache only apply to this worker
+    Download.rate_limiter = RateLimiter(rate_limit)
+    Download.disk_writer = DiskWriter(fsync=fsync)
+    link_cache = LinkCache(ttl=cache_ttl)
+
+    # downloads of the tasks held by this worker, so the ones whose lease is lost can be stopped
+    running = {}
+    lost = set()
+    stopping = False
+
+    def lease_lost(key: str):
+        # another worker may claim the task and write the same file, so the download stops right away instead of
+        # waiting for the main loop
+        lost.add(key)
+        download = running.get(key)
+        if download is not None and download.is_running:
+            download.stop()
+
+    work_queue = WorkQueue(queue_path, lease_time, on_lost=lease_lost)
+
+    def finish(key: str, download: Download, future: Future):
+        running.pop(key, None)
+
+        # the tasks of a worker that's stopping are given back when the queue is closed
+        if stopping:
+            return
+
+        # a lost task belongs to another worker now, but this one may claim it again once its lease expires
+        if key in lost:
+            lost.discard(key)
+            if download in download.download_list:
+                download.download_list.remove(download)
+
+            return
+
+        try:
+            future.result()
+
+        except Exception as error:
+            print(f"Could not download '{key}': {error}")
+
+        if download.progress >= 100:
+            work_queue.complete(key)
+
+        else:
+            work_queue.release(key, failed=True)
+
+    browser_pool = None
+    renderer = None
+    try:
+        browser_pool = BrowserPool(browsers, browser_address)
+        manager = DownloadManager(max_downloads)
+
+        renderer = ProgressRenderer(download_class)
+        renderer.start()
+        with contextlib.redirect_stdout(renderer):
+            while True:
+                # only claim a task once it can start right away
+                manager.wait_slot()
+                task = work_queue.claim()
+                if task is None:
+                    # tasks leased by other workers come back to the queue if they crash, so wait for them
+                    if not work_queue.counts()["leased"]:
+                        break
+
+                    time.sleep(poll_interval)
+                    continue
+
+                key, payload = task
+                season_dict = {
+                    "series-name": payload["series-name"],
+                    "season-number": payload["season-number"],
+                    "episodes": [payload["episode"]]
+                }
+                file_path = f"{get_season_folder(season_dict, payload["output"])}/{get_file_name(payload["episode"], payload["extension"])}"
+
+                try:
+                    queued = queue_downloads(season_dict, payload["output"], payload["download-key"], payload["extension"], manager, browser_pool, link_cache, download_class, segments=segments, per_download_limit=per_download_limit, look_ahead=0, release_browsers=False)
+
+                except Exception as error:
+                    print(f"Could not start '{key}': {error}")
+                    work_queue.release(key, failed=True)
+                    continue
+
+                # nothing is queued if the file is already complete or the episode has no link
+                if not queued:
+                    if is_complete(file_path):
+                        work_queue.complete(key)
+
+                    else:
+                        print(f"Could not start '{key}'.")
+                        work_queue.release(key, failed=True)
+
+                    continue
+
+                download, future = queued[0]
+                running[key] = download
+
+                # the lease may have been lost while the link was resolved
+                if key in lost and download.is_running:
+                    download.stop()
+
+                future.add_done_callback(lambda future, key=key, download=download: finish(key, download, future))
+
+        browser_pool.quit()
+        browser_pool = None
+
+        # wait for the last downloads to finish
+        manager.wait_all()
+        manager.shutdown()
+
+        if download_class is not Download:
+            download_class.close()
+
+    except KeyboardInterrupt:
+        stopping = True
+
+    finally:
+        # close browser instances
+        if browser_pool is not None:
+            browser_pool.quit()
+
+        # draw the last frame
+        if renderer is not None:
+            renderer.stop()
+
+        # tasks that are still held go back to the queue
+        work_queue.close()
+
+def serve_browser():
+    # keeps a browser running so other runs can attach to it instead of starting their own
+    browser = start_browser()
+    if browser is None:
+        return
+
+    try:
+        print(f"Browser listening at {browser.options.debugger_address}, pass it to '--browser-address'. Press Ctrl+C to close it.")
+        threading.Event().wait()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        print("Closing browser...")
+        browser.quit()
+
+class BrowserPool():
+    """A pool of headless browsers used to resolve mixdrop links in parallel.
+
+    Browsers are only started when a task needs one and every browser already running is busy, so runs that never
+    need a browser don't start any. Once they're quit, the next task starts them again.
+
+    Attributes:
+    -----------
+    size : int
+        The maximum number of browsers on the pool.
+    """
+
+    def __init__(self, size: int = 1, browser_address: str | None = None):
+        """Initializes a BrowserPool instance, without starting any browser.
+
+        Parameters:
+        -----------
+        size : int, optional
+            The maximum number of browsers on the pool (default is 1).
+        
+        browser_address : str | None, optional
+            The address of a browser started by 'serve-browser' (default is None). If given, each browser on the
+            pool is a tab attached to it instead of a new browser.
+        """
+
+        self.size = size
+        self._browser_address = browser_address
+        self._browsers = []
+        self._idle = []
+        self._condition = threading.Condition()
+
+    def _get_browser(self):
+        with self._condition:
+            while not self._idle and len(self._browsers) >= self.size:
+                self._condition.wait()
+
+            if self._idle:
+                return self._idle.pop()
+
+            # browsers are started one at a time since they all patch the same driver
+            browser = start_browser(self._browser_address)
+            if browser is None:
+                raise KeyboardInterrupt
+
+            self._browsers.append(browser)
+            return browser
+
+    def run(self, function, *args):
+        """Calls a function with an idle browser as its first argument, starting one if they're all busy and the
+        pool isn't full, or waiting for one otherwise.
+
+        Parameters:
+        -----------
+        function : Callable
+            The function to be called as `function(browser, *args)`.
+
+        *args
+            The other arguments of the function.
+
+        Returns:
+        --------
+        Any
+            The value returned by the function.
+        
+        Raises:
+        -------
+        KeyboardInterrupt:
+            If the startup of a browser is interrupted.
+        """
+
+        browser = self._get_browser()
+        try:
+            return function(browser, *args)
+
+        finally:
+            # a browser that was quit while it was in use isn't given back
+            with self._condition:
+                if browser in self._browsers:
+                    self._idle.append(browser)
+                    self._condition.notify()
+
+    def resolve(self, url: str):
+        """Gets the direct download link from a mixdrop page, waiting for an idle browser.
+
+        Parameters:
+        -----------
+        url : str
+            The url to the mixdrop page.
+        
+        Returns:
+        --------
+        str | None
+            The direct download link.
+        """
+
+        return self.run(get_download_link_from_mixdrop, url)
+
+    def quit(self):
+        """Closes every browser on the pool, which is started again if another task needs it."""
+
+        with self._condition:
+            browsers = self._browsers
+            self._browsers = []
+            self._idle = []
+
+            # tasks waiting for a browser start a new one
+            self._condition.notify_all()
+
+        for browser in browsers:
+            browser.quit()
+
+@metrics.timed('request_download_data')
 def request_download_data(episode: dict):
-    url = r"https://vizertv.in/includes/ajax/publicFunctions.php"
+    url = AJAX_URL
     payload = {'downloadData': 2, 'id': int(episode["id"])}
 
-    response = requests.post(url, data=payload)
+    with host_slot(url):
+        response = session.post(url, data=payload)
 
     # check if response status code is valid before proceeding
     if response.status_code != 200:
@@ -76,26 +476,30 @@ def request_download_data(episode: dict):
     # get dictionary containing the response
     response_json = response.json()
 
-    # get redirect links and subtitle link from response
-    orig_audio_redirect = None 
-    dub_audio_redirect = None
+    # get the redirect links of every mirror and the subtitle link from response
+    orig_audio_redirects = []
+    dub_audio_redirects = []
     subtitles = None
     for key in response_json:
         entry: dict = response_json[key]
         if "sub" in entry.keys(): 
-            orig_audio_redirect = entry["redirector"]
-            subtitles = entry["sub"]
+            orig_audio_redirects.append(entry["redirector"])
+            if subtitles is None:
+                subtitles = entry["sub"]
 
         else:
-            dub_audio_redirect = entry["redirector"]
+            dub_audio_redirects.append(entry["redirector"])
     
-    return orig_audio_redirect, dub_audio_redirect, subtitles
+    return orig_audio_redirects, dub_audio_redirects, subtitles
 
+@metrics.timed('request_download_link')
 def request_download_link(redirect_link: str):
     if redirect_link is None:
         return None
     
-    response = requests.get(f"https://vizertv.in/{redirect_link}")
+    with host_slot(f"https://vizertv.in/{redirect_link}"):
+        response = session.get(f"https://vizertv.in/{redirect_link}")
+    from bs4 import BeautifulSoup
     html = BeautifulSoup(response.content, 'html.parser')
 
     download_link = re.search(r'window\.location\.href=\".*(mixdrop.+)\"', str(html))
@@ -108,7 +512,11 @@ def request_download_link(redirect_link: str):
     
     return download_link
 
-def get_download_link_from_mixdrop(browser: uc.Chrome, url: str):
+@metrics.timed('get_download_link_from_mixdrop')
+def get_download_link_from_mixdrop(browser: 'uc.Chrome', url: str):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+
     if url is None:
         return None
     
@@ -119,109 +527,285 @@ def get_download_link_from_mixdrop(browser: uc.Chrome, url: str):
     browser.get(url)
 
     # click button
-    download_btn = browser.find_element(By.CLASS_NAME, "download-btn")
+    download_btn = wait_for_element(browser, By.CLASS_NAME, "download-btn")
     time.sleep(1+random.random()*1)
     download_btn.click()
 
-    # get download link
-    download_link = None
-    while download_link is None:
-        download_link = browser.find_element(By.CLASS_NAME, "download-btn").get_dom_attribute("href")
-        time.sleep(0.5)
+    # get download link as soon as the button gets one
+    download_link = WebDriverWait(browser, 15, poll_frequency=0.1).until(
+        lambda browser: browser.find_element(By.CLASS_NAME, "download-btn").get_dom_attribute("href")
+    )
     
     return download_link
 
-def get_episodes_data(url: str, season: int):
-    try:
-        # get browser into view
-        browser = None
-        browser = start_browser()
-        browser.set_window_size(1200, 600)
+def resolve_episode(episode: dict, link_cache: LinkCache):
+    # make post request for the download data associated with the episode, unless a recent run already did
+    data_key = f"{episode["id"]}/download-mirrors"
+    download_data = link_cache.get(data_key)
+    if download_data is None:
+        download_data = request_download_data(episode)
+        link_cache.set(data_key, download_data)
 
-        # get web page
-        browser.get(url)
+    orig_audio_redirects, dub_audio_redirects, subtitles = download_data
 
-        # find the 'choose season' button and click it
-        print("Searching for season...")
-        select_season_btn = browser.find_element(By.CLASS_NAME, "seasons")
-        select_season_btn.click()
+    # get download links from the redirectors of every mirror, leaving out the ones that can't be resolved
+    mirrors = []
+    for redirect_links in (orig_audio_redirects, dub_audio_redirects):
+        download_links = []
+        error = None
+        for redirect_link in redirect_links:
+            link_key = f"{episode["id"]}/{redirect_link}"
+            download_link = link_cache.get(link_key)
+            if download_link is None:
+                try:
+                    download_link = request_download_link(redirect_link)
 
-        # find all season buttons
-        season_btn_list = browser.find_element(By.XPATH, "/html/body/main/div[3]/div/div[3]/div[2]/div[2]").find_elements(By.CLASS_NAME, "item")
+                except requests.RequestException as link_error:
+                    error = link_error
+                    continue
 
-        # search for the button for the specified season and click it
-        for season_btn in season_btn_list:
-            season_number = re.match(r"^([0-9]+)", season_btn.text)
-            if season_number:
-                season_number = int(season_number.group(1))
+                link_cache.set(link_key, download_link)
 
-            if season_number == season:
-                season_btn.click()
-                break
-        else:
-            browser.close()
-            message = f"Season '{season}' does not exist on the given url ({url})."
-            raise AttributeError(message)
+            download_links.append(download_link)
+
+        # an audio is only missing if none of its mirrors could be resolved
+        if redirect_links and not download_links:
+            raise error
+
+        mirrors.append(download_links)
+
+    download_dict = {
+        "original-audio": mirrors[0][0] if mirrors[0] else None,
+        "dubbed-audio": mirrors[1][0] if mirrors[1] else None,
+        "subtitles": subtitles
+    }
+    mirror_dict = {
+        "original-audio": mirrors[0],
+        "dubbed-audio": mirrors[1]
+    }
+    return download_dict, mirror_dict
+
+def scrape_season(browser: 'webdriver.Chrome', url: str, season: int):
+    from selenium.webdriver.common.by import By
+
+    # get browser into view
+    browser.set_window_size(1200, 600)
+
+    # get web page
+    browser.get(url)
 
-        # get info from all episode from that season and the name of the series
-        episode_list = browser.find_element(By.XPATH, "/html/body/main/div[3]/div/div[3]/div[3]").find_elements(By.CSS_SELECTOR, "div.item[data-episode-id]")
-        series_name = browser.find_element(By.CSS_SELECTOR, "h2").text
+    # find the 'choose season' button and click it
+    print("Searching for season...")
+    select_season_btn = wait_for_element(browser, By.CLASS_NAME, "seasons")
+    select_season_btn.click()
+
+    # find all season buttons
+    season_btn_list = wait_for_element(browser, By.XPATH, "/html/body/main/div[3]/div/div[3]/div[2]/div[2]").find_elements(By.CLASS_NAME, "item")
+
+    # search for the button for the specified season and click it
+    for season_btn in season_btn_list:
+        season_number = re.match(r"^([0-9]+)", season_btn.text)
+        if season_number:
+            season_number = int(season_number.group(1))
+
+        if season_number == season:
+            season_btn.click()
+            break
+    else:
+        message = f"Season '{season}' does not exist on the given url ({url})."
+        raise AttributeError(message)
+
+    # get info from all episode from that season and the name of the series
+    wait_for_element(browser, By.CSS_SELECTOR, "div.item[data-episode-id]")
+    episode_list = browser.find_element(By.XPATH, "/html/body/main/div[3]/div/div[3]/div[3]").find_elements(By.CSS_SELECTOR, "div.item[data-episode-id]")
+    series_name = browser.find_element(By.CSS_SELECTOR, "h2").text
+    
+    # set up dictionary for storing the informations from that season
+    season_dict = {
+        "series-name": series_name,
+        "season-number": season,
+        "episodes": []
+    }
+
+    # cycle trhough every episode and store its properties inside 'season_dict'
+    for episode in episode_list:
+        episode_id = episode.get_dom_attribute("data-episode-id")
+        title_string = episode.find_element(By.CLASS_NAME, "tit").text
+        episode_number, episode_title = title_string.split('.', 1)
+        episode_title = episode_title.strip()
+        episode_info = episode.find_element(By.CLASS_NAME, "info").text
+
+        episode_dict = {
+            "episode-number": episode_number,
+            "title": episode_title,
+            "info": episode_info,
+            "id": episode_id
+        }
         
-        # set up dictionary for storing the informations from that season
+        season_dict["episodes"].append(episode_dict)
+        print(f"Got episode data for '{episode_number}. {episode_title}'.")
+
+    return season_dict
+
+@metrics.timed('fetch_season_listing')
+def fetch_season_listing(url: str, season: int):
+    # the episodes of a season are loaded by the page through the ajax endpoint, so they can usually be listed
+    # without a browser, returns None whenever the page or the response don't look as expected
+    try:
+        with host_slot(url):
+            response = session.get(url, headers={"User-Agent": mixdrop.USER_AGENT}, timeout=15)
+
+        if response.status_code != 200:
+            return None
+
+        from bs4 import BeautifulSoup
+        html = BeautifulSoup(response.content, 'html.parser')
+        series_name = html.find("h2").get_text(strip=True)
+
+        # find the id of the season from its button
+        season_id = None
+        for season_btn in html.select("div.item[data-season-id]"):
+            season_number = re.match(r"^([0-9]+)", season_btn.get_text(strip=True))
+            if season_number and int(season_number.group(1)) == season:
+                season_id = season_btn["data-season-id"]
+                break
+
+        if season_id is None:
+            return None
+
+        with host_slot(AJAX_URL):
+            response = session.post(AJAX_URL, data={'getEpisodes': season_id}, headers={"Referer": url}, timeout=15)
+
+        if response.status_code != 200:
+            return None
+
         season_dict = {
             "series-name": series_name,
             "season-number": season,
             "episodes": []
         }
 
-        # cycle trhough every episode and store its properties inside 'season_dict'
-        for episode in episode_list:
-            episode_id = episode.get_dom_attribute("data-episode-id")
-            title_string = episode.find_element(By.CLASS_NAME, "tit").text
-            episode_number, episode_title = title_string.split('.', 1)
-            episode_title = episode_title.strip()
-            episode_info = episode.find_element(By.CLASS_NAME, "info").text
-
-            episode_dict = {
-                "episode-number": episode_number,
-                "title": episode_title,
-                "info": episode_info,
-                "id": episode_id
-            }
-            
-            season_dict["episodes"].append(episode_dict)
-            print(f"Got episode data for '{episode_number}. {episode_title}'.")
+        for entry in response.json()["list"].values():
+            season_dict["episodes"].append({
+                "episode-number": str(entry["name"]),
+                "title": entry["title"].strip(),
+                "info": ' '.join(str(entry[key]) for key in ("rating", "released") if entry.get(key)),
+                "id": str(entry["id"])
+            })
 
-        browser.quit()
+    except (requests.RequestException, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+    if not season_dict["episodes"]:
+        return None
+
+    season_dict["episodes"].sort(key=lambda episode: int(episode["episode-number"]))
+    print(f"Got {len(season_dict["episodes"])} episodes from the season listing.")
+    return season_dict
+
+def get_season_path(series_name: str, season: int):
+    return f"output/{series_name} S{str(season).zfill(2)}.json"
+
+def load_season(json_path: str):
+    if not os.path.exists(json_path):
+        return None
+
+    with open(json_path, 'r') as file:
+        return json.load(file)
+
+def get_stale_episodes(season_dict: dict, previous: dict | None, refresh_after: float | None = None):
+    # without a previous json every episode has to be resolved
+    if previous is None:
+        return season_dict["episodes"]
+
+    previous_episodes = {episode["id"]: episode for episode in previous["episodes"]}
+    stale_episodes = []
+    for episode in season_dict["episodes"]:
+        old_episode = previous_episodes.get(episode["id"])
+
+        # new episodes, renumbered or renamed ones and the ones that failed last time are resolved again
+        if (
+            old_episode is None
+            or (old_episode["episode-number"], old_episode["title"]) != (episode["episode-number"], episode["title"])
+            or not any((old_episode.get("downloads") or {}).values())
+            or refresh_after is not None and time.time() - old_episode.get("resolved-at", 0) >= refresh_after
+        ):
+            stale_episodes.append(episode)
+            continue
+
+        # the others keep their links
+        episode["downloads"] = old_episode["downloads"]
+        if "mirrors" in old_episode:
+            episode["mirrors"] = old_episode["mirrors"]
+        if "resolved-at" in old_episode:
+            episode["resolved-at"] = old_episode["resolved-at"]
+
+    return stale_episodes
+
+def resolve_season_links(season_dict: dict, link_cache: LinkCache, max_workers: int = 8, episodes: list[dict] | None = None):
+    if episodes is None:
+        episodes = season_dict["episodes"]
+
+    # get download links for every episode at the same time, keeping their order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(resolve_episode, episode, link_cache) for episode in episodes]
+        
+        for episode, future in zip(episodes, futures):
+            # a failed episode, including one with a malformed entry on the response, is saved without links
+            # instead of stopping the others
+            try:
+                download_dict, mirror_dict = future.result()
+                episode["resolved-at"] = int(time.time())
+                print(f"Got download data for '{episode["episode-number"]}. {episode["title"]}'.")
+        
+            except (requests.RequestException, ValueError, KeyError, TypeError) as error:
+                download_dict = {
+                    "original-audio": None,
+                    "dubbed-audio": None,
+                    "subtitles": None
+                }
+                mirror_dict = {
+                    "original-audio": [],
+                    "dubbed-audio": []
+                }
+                print(f"Could not get download data for '{episode["episode-number"]}. {episode["title"]}': {error}")
+        
+            episode.update({"downloads": download_dict, "mirrors": mirror_dict})
+
+def save_season(season_dict: dict):
+    json_path = get_season_path(season_dict["series-name"], season_dict["season-number"])
+
+    # write to a temporary file first so an interrupted update never leaves a half written json
+    with open(f"{json_path}.tmp", 'w') as file:
+        json.dump(season_dict, file, indent=2)
+
+    os.replace(f"{json_path}.tmp", json_path)
+    return json_path
+
+def get_episodes_data(url: str, season: int, max_workers: int = 8, cache_ttl: float = 6 * 3600, browser_address: str | None = None, incremental: bool = False, refresh_after: float | None = None):
+    try:
         browser = None
+
+        # an incremental refresh lists the episodes over http first and only uses the browser if that fails
+        season_dict = fetch_season_listing(url, season) if incremental else None
+        if season_dict is None:
+            browser = start_browser(browser_address)
+            season_dict = scrape_season(browser, url, season)
             
-        # get download links
-        for index, episode in enumerate(season_dict["episodes"]):
-            # make post request for the download data associated with the current episode 
-            print(f"Requesting download data for '{episode["episode-number"]}. {episode["title"]}'.")
-            orig_audio_redirect, dub_audio_redirect, subtitles = request_download_data(episode)
-            
-            # get original audio download link from redirector
-            print("Requesting original audio download link.")
-            orig_audio_download_link = request_download_link(orig_audio_redirect)
-            
-            # get dubbed audio download link from redirector
-            print("Requesting dubbed audio download link.")
-            dub_audio_download_link = request_download_link(dub_audio_redirect)
-            
-            # save data to season_dict
-            download_dict = {
-                "original-audio": orig_audio_download_link,
-                "dubbed-audio": dub_audio_download_link,
-                "subtitles": subtitles
-            }
-
-            season_dict["episodes"][index].update({"downloads": download_dict})
-            print(f"Got download data for '{episode["episode-number"]}. {episode["title"]}'.")
+            browser.quit()
+            browser = None
+
+        # only resolve the episodes that changed since the season json was saved
+        episodes = season_dict["episodes"]
+        if incremental:
+            previous = load_season(get_season_path(season_dict["series-name"], season))
+            episodes = get_stale_episodes(season_dict, previous, refresh_after)
+            print(f"{len(episodes)} of {len(season_dict["episodes"])} episodes are new, changed or expired.")
+
+        resolve_season_links(season_dict, LinkCache(ttl=cache_ttl), max_workers, episodes)
         
         # save json file
-        with open(f"output/{season_dict["series-name"]} S{str(season).zfill(2)}.json", 'w') as file:
-            json.dump(season_dict, file, indent=2)
+        save_season(season_dict)
     
         return season_dict
 
@@ -232,89 +816,467 @@ def get_episodes_data(url: str, season: int):
         if browser is not None:
             browser.quit()
 
-def download_all(json_path: str, output_path: str, download_key: str, extension: str, start_from: int = 0, stop_at: int | None = None, max_downloads: int = 3):
-    # read json data
-    with open(json_path, 'r') as file:
-        season_dict = json.load(file)
+def get_file_name(episode: dict, extension: str):
+    # get episode rating
+    rating = re.findall(r"([0-9]{1,2}\.[0-9]{1,2})", episode["info"])
+    if rating:
+        rating = rating[0]
     
+    else:
+        rating = "--"
+
+    return f"{episode["episode-number"]}. {episode["title"]} ({rating}){extension}"
+
+def is_complete(file_path: str):
+    # the '.part' file is only renamed to the output file once every byte has been written
+    if not os.path.exists(file_path) or os.path.exists(f"{file_path}.part"):
+        return False
+
+    # files that failed their integrity check are downloaded again, files from before it was added are trusted
+    verdict = integrity.load_verdict(file_path)
+    return verdict is None or verdict["valid"]
+
+def get_season_folder(season_dict: dict, output_path: str):
+    # the files of a season are saved on '<output>/<series>/Temporada <season>'
+    return f"{output_path.replace('\\', '/')}/{season_dict["series-name"]}/Temporada {season_dict["season-number"]}"
+
+def queue_downloads(season_dict: dict, output_path: str, download_key: str, extension: str, manager: DownloadManager, browser_pool: BrowserPool, link_cache: LinkCache, download_class: type[Download] = Download, start_from: int = 0, stop_at: int | None = None, segments: int = 1, per_download_limit: float | None = None, look_ahead: int = 2, streaming: bool = False, release_browsers: bool = True, small_files: SmallFileFetcher | None = None):
     # get output path
-    output_path = f"{output_path.replace('\\', '/')}/{season_dict["series-name"]}/Temporada {season_dict["season-number"]}"
+    output_path = get_season_folder(season_dict, output_path)
 
     if not os.path.isdir(output_path):
         os.makedirs(output_path)
 
-    # start downloading
-    try:
-        # start browser instance
-        browser = None
-        browser = start_browser()
-        if browser is None:
-            return
+    # get every episode in range that has a link for the chosen key
+    episode_list = []
+    for episode in season_dict["episodes"]:
+        # skip episode from before 'start_from'
+        if int(episode["episode-number"]) < start_from:
+            continue
+        
+        # break the loop at 'stop_at' episode
+        elif stop_at is not None and int(episode["episode-number"]) > stop_at:
+            break
 
-        # creates a thread for showing downloads progress
-        def show_progress_thread():
-            while True:
-                Download.show_all_progress()
-                time.sleep(0.1)
-                
-        threading.Thread(target=show_progress_thread, daemon=True).start()
+        # files downloaded by a previous run don't need their links resolved again
+        if is_complete(f"{output_path}/{get_file_name(episode, extension)}"):
+            continue
 
-        # cycle through every episode on the json
-        for episode in season_dict["episodes"]:
-            # skip episode from before 'start_from'
-            if int(episode["episode-number"]) < start_from:
-                continue
-            
-            # break the loop at 'stop_at' episode
-            elif stop_at is not None and int(episode["episode-number"]) > stop_at:
-                break
+        if episode["downloads"][download_key] is not None:
+            episode_list.append(episode)
 
-            # waits if there's at least 3 currently active downloads
-            while Download.get_running_count() >= max_downloads:
-                time.sleep(0.1)
-            
-            # get episode rating
-            rating = re.findall(r"([0-9]{1,2}\.[0-9]{1,2})", episode["info"])
-            if rating:
-                rating = rating[0]
+    def resolve_mirror(episode: dict, url: str, invalidate: bool = False):
+        if "mixdrop" not in url:
+            return url, False
+        
+        # reuse the link resolved by a recent run if there's any
+        cache_key = f"{episode["id"]}/{url}"
+        if invalidate:
+            link_cache.invalidate(cache_key)
 
-            else:
-                rating = "--"
+        download_link = link_cache.get(cache_key)
+        metrics.record('link_cache', hit=download_link is not None)
+        if download_link is not None:
+            return download_link, True
+        
+        # the link can usually be read from the page itself
+        with metrics.timed('mixdrop_http') as event:
+            download_link = mixdrop.get_download_link(url, session)
+            event["resolved"] = download_link is not None
 
-            # get download url
-            url = episode["downloads"][download_key]
+        if download_link is not None:
+            link_cache.set(cache_key, download_link)
 
-            # get file name
-            file_name = f"{episode["episode-number"]}. {episode["title"]} ({rating}){extension}"
-            
-            # get download link
-            if "mixdrop" in url:
-                download_link = get_download_link_from_mixdrop(browser, url)
+        return download_link, False
 
-            else:
-                download_link = url
+    def resolve_link(episode: dict, invalidate: bool = False):
+        # every mirror of the file, runs from before mirrors were kept only have the one on 'downloads'
+        urls = (episode.get("mirrors") or {}).get(download_key) or [episode["downloads"][download_key]]
+
+        download_links = []
+        unresolved = []
+        from_cache = False
+        for url in urls:
+            download_link, cached = resolve_mirror(episode, url, invalidate)
+            if download_link is None:
+                unresolved.append(url)
+                continue
+
+            download_links.append(download_link)
+            from_cache = from_cache or cached
 
-            # start download
+        # the browser is only needed when none of the mixdrop mirrors could be read over HTTP
+        if unresolved and len(unresolved) == sum("mixdrop" in url for url in urls):
+            download_link = browser_pool.resolve(unresolved[0])
+            link_cache.set(f"{episode["id"]}/{unresolved[0]}", download_link)
             if download_link is not None:
-                # filter warnnings to avoid breaking the progress printing
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    Download(download_link, f"{output_path}/{file_name}").start()
-        
-        browser.quit()
-        browser = None
+                download_links.insert(0, download_link)
+
+        if not download_links:
+            return [None], False
+
+        # start from the fastest mirror, the others are kept to move to if it fails
+        if len(download_links) > 1:
+            download_links = Download.rank_sources(download_links) or download_links
+
+        return download_links, from_cache
+
+    # resolve links ahead of the download queue so a link is ready as soon as a slot is free
+    executor = ThreadPoolExecutor(max_workers=browser_pool.size)
+    pending = deque()
+    next_episode = 0
+
+    # every download submitted to the manager, along with the future resolved once it ends
+    queued = []
+
+    try:
+        # cycle through every episode on the json
+        for episode in episode_list:
+            # the link of this episode is only missing if it wasn't resolved ahead already
+            if not pending:
+                pending.append(executor.submit(resolve_link, episode))
+                next_episode += 1
+
+            current = pending.popleft()
+
+            # the next links are resolved in the background while this one is downloaded
+            while next_episode < len(episode_list) and len(pending) < look_ahead:
+                pending.append(executor.submit(resolve_link, episode_list[next_episode]))
+                next_episode += 1
+
+            # a failure on one episode, like a link that can't be resolved or probed, doesn't stop the others
+            try:
+                download_links, from_cache = current.result()
+
+                # every link is resolved, so the browsers can be closed while the last downloads wait for a slot
+                if release_browsers and next_episode == len(episode_list) and not pending:
+                    browser_pool.quit()
+
+                # get file name
+                file_name = get_file_name(episode, extension)
+
+                # small files like subtitles don't take a download slot, they're all fetched at once
+                if small_files is not None and download_links[0] is not None and SmallFileFetcher.is_small(file_name):
+                    small_files.submit(download_links, f"{output_path}/{file_name}")
+                    continue
+
+                # waits until there's a free download slot
+                manager.wait_slot()
+
+                # start download
+                if download_links[0] is not None:
+                    # earlier episodes are watched first, so they get the bandwidth first
+                    priority = -int(episode["episode-number"])
+
+                    def create_download(download_links: list[str]):
+                        # try the mirrors in order, the ones after the chosen one are where the download moves if it fails
+                        for index, download_link in enumerate(download_links):
+                            try:
+                                # filter warnnings to avoid breaking the progress printing
+                                with warnings.catch_warnings():
+                                    warnings.simplefilter("ignore")
+                                    if download_class is Download:
+                                        return Download(download_link, f"{output_path}/{file_name}", segments=segments, rate_limit=per_download_limit, priority=priority, mirrors=download_links[index + 1:], streaming=streaming)
+
+                                    # the other engines only probe once they start, too late to resolve a stale cached link again
+                                    if from_cache:
+                                        Download._probe(download_link, {})
+
+                                    return download_class(download_link, f"{output_path}/{file_name}", rate_limit=per_download_limit, priority=priority, mirrors=download_links[index + 1:])
+
+                            except requests.RequestException:
+                                if index == len(download_links) - 1:
+                                    raise
+
+                    try:
+                        download = create_download(download_links)
+
+                    except requests.RequestException as error:
+                        # a cached direct link can stop working before it expires, so resolve it again
+                        if not from_cache or error.response is None or error.response.status_code not in (403, 404):
+                            raise
+
+                        download_links, from_cache = resolve_link(episode, invalidate=True)
+                        download = create_download(download_links)
+
+                    # a file that's small once probed is fetched in one go too, unless it's already partly downloaded
+                    if small_files is not None and download.written_bytes == 0 and SmallFileFetcher.is_small(file_name, download.total_size):
+                        download_class.download_list.remove(download)
+                        small_files.submit([download.url] + download.mirrors, download.output_file)
+                        continue
+
+                    # finished files don't need a slot
+                    if download.progress < 100:
+                        queued.append((download, manager.submit(download)))
+
+            except Exception as error:
+                print(f"Could not download episode {episode["episode-number"]}: {error}")
+
+    finally:
+        # drop the links that are still waiting to be resolved
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return queued
+
+def get_download_class(engine: str, max_downloads: int = 3):
+    # only import the asyncio engine when it's used
+    if engine == 'async':
+        from async_downloader import AsyncDownload
+
+        # the manager doesn't hold a slot for these downloads, so the event loop caps them instead
+        AsyncDownload.max_concurrent = max_downloads
+        return AsyncDownload
+    
+    return Download
+
+def download_all(json_path: str, output_path: str, download_key: str, extension: str, start_from: int = 0, stop_at: int | None = None, max_downloads: int = 3, segments: int = 1, engine: str = 'threads', rate_limit: float | None = None, per_download_limit: float | None = None, cache_ttl: float = 6 * 3600, browsers: int = 1, look_ahead: int = 2, browser_address: str | None = None, fsync: str = 'complete'):
+    # read json data
+    with open(json_path, 'r') as file:
+        season_dict = json.load(file)
+
+    # choose the download engine
+    download_class = get_download_class(engine, max_downloads)
+
+    # cap the bandwidth shared by every download
+    Download.rate_limiter = RateLimiter(rate_limit)
+
+    # when the data written by every download is forced to the disk
+    Download.disk_writer = DiskWriter(fsync=fsync)
+
+    # links resolved by recent runs
+    link_cache = LinkCache(ttl=cache_ttl)
+
+    # start downloading
+    browser_pool = None
+    renderer = None
+    small_files = None
+    try:
+        # browsers are only started once a link needs one
+        browser_pool = BrowserPool(browsers, browser_address)
+
+        # runs the downloads on a bounded pool of workers
+        manager = DownloadManager(max_downloads)
+
+        # fetches subtitles and other small files outside of the download slots
+        small_files = SmallFileFetcher()
+
+        # shows the progress of the running downloads on its own thread
+        renderer = ProgressRenderer(download_class)
+        renderer.start()
+
+        queue_downloads(season_dict, output_path, download_key, extension, manager, browser_pool, link_cache, download_class, start_from, stop_at, segments, per_download_limit, look_ahead, small_files=small_files)
+
+        browser_pool.quit()
+        browser_pool = None
         
         # wait for the last downloads to finish
-        Download.wait_downloads(False)
-        time.sleep(0.5) # wait for one last update on the show_progress_thread before finishing
+        small_files.shutdown()
+        manager.wait_all()
+        manager.shutdown()
+
+        if download_class is not Download:
+            download_class.close()
     
     except KeyboardInterrupt:
         pass
     
     finally:
-        # close browser instance
-        if browser is not None:
-            browser.quit()
+        # close browser instances
+        if browser_pool is not None:
+            browser_pool.quit()
+
+        # drop the small files that haven't started
+        if small_files is not None:
+            small_files.shutdown(wait=False)
+            if renderer is not None and (small_files.fetched or small_files.failed):
+                renderer.write(f"Fetched {small_files.fetched} small files, {small_files.failed} failed.\n")
+
+        # draw the last frame
+        if renderer is not None:
+            renderer.stop()
+
+
+def watch_episode(json_path: str, output_path: str, download_key: str, extension: str, episode_number: int, segments: int = 4, pipe: bool = False, port: int = 0, cache_ttl: float = 6 * 3600, browser_address: str | None = None):
+    # read json data
+    with open(json_path, 'r') as file:
+        season_dict = json.load(file)
+
+    # links resolved by recent runs
+    link_cache = LinkCache(ttl=cache_ttl)
+
+    browser_pool = None
+    renderer = None
+    server = None
+    try:
+        browser_pool = BrowserPool(1, browser_address)
+        manager = DownloadManager(1)
+
+        # the episode is downloaded in playback order, so it can be played while the rest of it arrives
+        queued = queue_downloads(season_dict, output_path, download_key, extension, manager, browser_pool, link_cache, Download, episode_number, episode_number, segments, look_ahead=0, streaming=True)
+
+        browser_pool.quit()
+        browser_pool = None
+
+        if not queued:
+            episode_folder = get_season_folder(season_dict, output_path)
+            for episode in season_dict["episodes"]:
+                if int(episode["episode-number"]) == episode_number and is_complete(f"{episode_folder}/{get_file_name(episode, extension)}"):
+                    print(f"The episode is already downloaded at '{episode_folder}/{get_file_name(episode, extension)}'.", file=sys.stderr)
+                    break
+
+            else:
+                print(f"There's no '{download_key}' link for episode {episode_number}.", file=sys.stderr)
+
+            return
+
+        download, _ = queued[0]
+
+        # the progress goes to stderr, so stdout only carries the file when it's piped to a player
+        renderer = ProgressRenderer(Download, stream=sys.stderr)
+        renderer.start()
+
+        if pipe:
+            try:
+                shutil.copyfileobj(download.open_stream(), sys.stdout.buffer, READ_SIZE)
+                sys.stdout.buffer.flush()
+
+            # the player was closed, the rest of the episode is still downloaded, and stdout goes nowhere so
+            # flushing it on exit doesn't fail again
+            except BrokenPipeError:
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+            manager.wait_all()
+
+        else:
+            server = StreamServer(download, port=port)
+            server.start()
+            renderer.write(f"Open '{server.url}' on a player, press Ctrl+C to stop.\n")
+
+            # keep serving the episode once it's downloaded, the player may still be playing it
+            manager.wait_all()
+            renderer.write(f"Download finished, still serving '{server.url}'.\n")
+            threading.Event().wait()
+
+        manager.shutdown()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        # close browser instances
+        if browser_pool is not None:
+            browser_pool.quit()
+
+        if server is not None:
+            server.stop()
+
+        # draw the last frame
+        if renderer is not None:
+            renderer.stop()
+
+
+def run_batch(job_path: str):
+    # read the job file, see 'batch --help' for its format
+    with open(job_path, 'r') as file:
+        job = json.load(file)
+
+    settings = job.get("settings", {})
+    download_class = get_download_class(settings.get("engine", 'threads'), settings.get("max-downloads", 3))
+    incremental = settings.get("incremental", False)
+    browsers = settings.get("browsers", 1)
+
+    # speed limits are in KB/s like on the command line
+    rate_limit = settings.get("rate-limit")
+    per_download_limit = settings.get("per-download-limit")
+    Download.rate_limiter = RateLimiter(rate_limit * 1000 if rate_limit else None)
+    per_download_limit = per_download_limit * 1000 if per_download_limit else None
+    Download.disk_writer = DiskWriter(fsync=settings.get("fsync", 'complete'))
+
+    # every season shares the same cache, browsers, download slots and session
+    link_cache = LinkCache(ttl=settings.get("cache-ttl", 6 * 3600))
+    browser_pool = None
+    renderer = None
+    small_files = None
+    try:
+        browser_pool = BrowserPool(browsers, settings.get("browser-address"))
+        manager = DownloadManager(settings.get("max-downloads", 3))
+        small_files = SmallFileFetcher()
+
+        # messages from scraping are printed above the progress instead of over it
+        renderer = ProgressRenderer(download_class)
+        renderer.start()
+        with contextlib.redirect_stdout(renderer):
+            for series in job["series"]:
+                for season in series["seasons"]:
+                    # scraping waits for a browser that's not resolving a mixdrop link
+                    season_dict = fetch_season_listing(series["url"], season) if incremental else None
+                    if season_dict is None:
+                        try:
+                            season_dict = browser_pool.run(scrape_season, series["url"], season)
+
+                        # any error of the browser skips the season instead of stopping the batch, which also keeps
+                        # batches that never scrape from importing selenium just to catch its timeouts
+                        except Exception as error:
+                            print(f"Could not get season {season} of '{series["url"]}': {error}")
+                            continue
+
+                    episodes = season_dict["episodes"]
+                    if incremental:
+                        previous = load_season(get_season_path(season_dict["series-name"], season))
+                        episodes = get_stale_episodes(season_dict, previous, settings.get("refresh-after"))
+
+                    resolve_season_links(season_dict, link_cache, settings.get("workers", 8), episodes)
+                    save_season(season_dict)
+
+                    # downloads of a season are queued while the ones from the previous season are still running
+                    for key in series.get("keys", ['dub']):
+                        download_key, extension = DOWNLOAD_KEYS[key]
+                        queue_downloads(
+                            season_dict,
+                            series.get("output", os.path.curdir),
+                            download_key,
+                            extension,
+                            manager,
+                            browser_pool,
+                            link_cache,
+                            download_class,
+                            series.get("start-from", 0),
+                            series.get("stop-at"),
+                            settings.get("segments", 1),
+                            per_download_limit,
+                            settings.get("look-ahead", 2),
+                            release_browsers=False,
+                            small_files=small_files
+                        )
+
+        browser_pool.quit()
+        browser_pool = None
+
+        # wait for the last downloads to finish
+        small_files.shutdown()
+        manager.wait_all()
+        manager.shutdown()
+
+        if download_class is not Download:
+            download_class.close()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        # close browser instances
+        if browser_pool is not None:
+            browser_pool.quit()
+
+        # drop the small files that haven't started
+        if small_files is not None:
+            small_files.shutdown(wait=False)
+            if renderer is not None and (small_files.fetched or small_files.failed):
+                renderer.write(f"Fetched {small_files.fetched} small files, {small_files.failed} failed.\n")
+
+        # draw the last frame
+        if renderer is not None:
+            renderer.stop()
 
 
 if __name__ == "__main__":
@@ -328,6 +1290,13 @@ if __name__ == "__main__":
     )
     info_args.add_argument('-url', '--url', type=str, required=True, help="url to the series page")
     info_args.add_argument('-s', '--season', type=int, required=True, help="number of the desired season")
+    info_args.add_argument('--cache-ttl', type=float, default=6 * 3600, help="number of seconds resolved links are reused for, 0 disables the cache")
+    info_args.add_argument('--browser-address', type=str, default=None, help="address of a browser started with 'serve-browser' to use instead of starting a new one")
+    info_args.add_argument('--workers', type=int, default=8, help="number of episodes whose download links are requested at the same time")
+    info_args.add_argument('--incremental', action='store_true', help="update the existing season json, only resolving episodes that are new, changed or expired")
+    info_args.add_argument('--refresh-after', type=float, default=None, help="with '--incremental', number of seconds after which the links of an episode are resolved again")
+    info_args.add_argument('--metrics', type=str, default=None, help="path to a json-lines file where the timing of every phase is appended")
+    info_args.add_argument('--prometheus', type=str, default=None, help="path to a Prometheus textfile where the totals of every phase are written")
 
     # download args
     download_args = subparser.add_parser(
@@ -340,28 +1309,148 @@ if __name__ == "__main__":
     download_args.add_argument('--start-from', type=int, default=0, help="number of the episode to start downloading from")
     download_args.add_argument('--stop-at', type=int, default=None, help="number of the episode to stop downloading at")
     download_args.add_argument('--max-downloads', type=int, default=3, help="number of maximum concurrent downloads")
+    download_args.add_argument('--segments', type=int, default=1, help="number of connections used to download each file")
+    download_args.add_argument('--rate-limit', type=float, default=None, help="maximum total download speed in KB/s")
+    download_args.add_argument('--per-download-limit', type=float, default=None, help="maximum download speed of each file in KB/s")
+    download_args.add_argument('--cache-ttl', type=float, default=6 * 3600, help="number of seconds resolved links are reused for, 0 disables the cache")
+    download_args.add_argument('--browsers', type=int, default=1, help="number of browsers used to get download links from mixdrop")
+    download_args.add_argument('--look-ahead', type=int, default=2, help="number of download links resolved ahead of the download queue")
+    download_args.add_argument('--browser-address', type=str, default=None, help="address of a browser started with 'serve-browser' to use instead of starting new ones")
+    download_args.add_argument('--fsync', default='complete', choices=['never', 'complete', 'journal'], help="when the downloaded data is forced to the disk: 'complete' once each transfer ends, 'journal' also before every resume checkpoint")
+    download_args.add_argument('--engine', default='threads', choices=['threads', 'async'], help="'threads' runs each download on its own thread, 'async' runs all of them on a single event loop")
+    download_args.add_argument('--metrics', type=str, default=None, help="path to a json-lines file where the timing of every phase and transfer is appended")
+    download_args.add_argument('--prometheus', type=str, default=None, help="path to a Prometheus textfile where the totals of every phase are written")
 
 
+    # batch args
+    batch_args = subparser.add_parser(
+        'batch',
+        help="scrapes and downloads every season listed on a job file, sharing the browsers, caches and download slots",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""the job file is a json like:
+{
+  "settings": {"max-downloads": 3, "segments": 1, "engine": "threads", "rate-limit": null,
+               "per-download-limit": null, "cache-ttl": 21600, "browsers": 1, "look-ahead": 2,
+               "browser-address": null, "workers": 8, "incremental": false, "refresh-after": null,
+               "fsync": "complete"},
+  "series": [
+    {"url": "https://vizertv.in/serie/...", "seasons": [1, 2], "keys": ["dub", "sub"],
+     "output": "downloads", "start-from": 0, "stop-at": null}
+  ]
+}
+every setting and every field of a series besides 'url' and 'seasons' is optional. files that are already
+complete on the output folder are skipped."""
+    )
+    batch_args.add_argument('-i', '--input', type=str, required=True, help="path to the json job file")
+    batch_args.add_argument('--metrics', type=str, default=None, help="path to a json-lines file where the timing of every phase and transfer is appended")
+    batch_args.add_argument('--prometheus', type=str, default=None, help="path to a Prometheus textfile where the totals of every phase are written")
+
+    # enqueue args
+    enqueue_args = subparser.add_parser(
+        'enqueue',
+        help="adds the episodes of a season json to a work queue shared by 'work' processes on one or many machines"
+    )
+    enqueue_args.add_argument('-q', '--queue', type=str, required=True, help="path to the work queue database, which can be on shared storage")
+    enqueue_args.add_argument('-i', '--input', type=str, required=True, help="path to the json file containing the download data")
+    enqueue_args.add_argument('-k', '--key', required=True, choices=['dub', 'eng', 'sub'], help="key to the download link: 'dub' for dubbed, 'eng' for english, 'sub' for subtitles")
+    enqueue_args.add_argument('-o', '--output', default=(os.path.curdir).replace('\\', '/'), help="path where the workers save the files")
+    enqueue_args.add_argument('--start-from', type=int, default=0, help="number of the episode to start downloading from")
+    enqueue_args.add_argument('--stop-at', type=int, default=None, help="number of the episode to stop downloading at")
+
+    # work args
+    work_args = subparser.add_parser(
+        'work',
+        help="downloads episodes claimed from a work queue until every one of them is done"
+    )
+    work_args.add_argument('-q', '--queue', type=str, required=True, help="path to the work queue database")
+    work_args.add_argument('--lease-time', type=float, default=300, help="number of seconds an episode stays claimed if this worker stops renewing it, like when it crashes")
+    work_args.add_argument('--max-downloads', type=int, default=3, help="number of maximum concurrent downloads")
+    work_args.add_argument('--segments', type=int, default=1, help="number of connections used to download each file")
+    work_args.add_argument('--rate-limit', type=float, default=None, help="maximum total download speed of this worker in KB/s")
+    work_args.add_argument('--per-download-limit', type=float, default=None, help="maximum download speed of each file in KB/s")
+    work_args.add_argument('--cache-ttl', type=float, default=6 * 3600, help="number of seconds resolved links are reused for, 0 disables the cache")
+    work_args.add_argument('--browsers', type=int, default=1, help="number of browsers used to get download links from mixdrop")
+    work_args.add_argument('--browser-address', type=str, default=None, help="address of a browser started with 'serve-browser' to use instead of starting new ones")
+    work_args.add_argument('--fsync', default='complete', choices=['never', 'complete', 'journal'], help="when the downloaded data is forced to the disk: 'complete' once each transfer ends, 'journal' also before every resume checkpoint")
+    work_args.add_argument('--engine', default='threads', choices=['threads', 'async'], help="'threads' runs each download on its own thread, 'async' runs all of them on a single event loop")
+    work_args.add_argument('--metrics', type=str, default=None, help="path to a json-lines file where the timing of every phase and transfer is appended")
+    work_args.add_argument('--prometheus', type=str, default=None, help="path to a Prometheus textfile where the totals of every phase are written")
+
+    # watch args
+    watch_args = subparser.add_parser(
+        'watch',
+        help="downloads an episode in playback order and plays it while it's downloaded, on a local address or piped to a player"
+    )
+    watch_args.add_argument('-i', '--input', type=str, required=True, help="path to the json file containing the download data")
+    watch_args.add_argument('-k', '--key', required=True, choices=['dub', 'eng', 'sub'], help="key to the download link: 'dub' for dubbed, 'eng' for english, 'sub' for subtitles")
+    watch_args.add_argument('-e', '--episode', type=int, required=True, help="number of the episode to watch")
+    watch_args.add_argument('-o', '--output', default=(os.path.curdir).replace('\\', '/'), help="path where the file will be saved")
+    watch_args.add_argument('--segments', type=int, default=4, help="number of connections used to download the file, each one fetching the next missing piece")
+    watch_args.add_argument('--pipe', action='store_true', help="writes the file to stdout in order, like 'watch ... --pipe | mpv -', instead of serving it")
+    watch_args.add_argument('--port', type=int, default=0, help="port of the local address the file is served on, 0 picks a free one")
+    watch_args.add_argument('--cache-ttl', type=float, default=6 * 3600, help="number of seconds resolved links are reused for, 0 disables the cache")
+    watch_args.add_argument('--browser-address', type=str, default=None, help="address of a browser started with 'serve-browser' to use instead of starting a new one")
+
+    # serve-browser args
+    subparser.add_parser(
+        'serve-browser',
+        help="starts a browser that stays open so 'info' and 'download' can attach to it instead of starting their own"
+    )
+
     args = parser.parse_args()
 
     if args.action is None:
         parser.print_help()
 
     elif args.action == 'info':
-        get_episodes_data(args.url, args.season)
+        metrics.open(args.metrics, args.prometheus)
+        try:
+            get_episodes_data(args.url, args.season, args.workers, args.cache_ttl, args.browser_address, args.incremental, args.refresh_after)
+
+        finally:
+            metrics.close()
+
+    elif args.action == 'serve-browser':
+        serve_browser()
+
+    elif args.action == 'watch':
+        download_key, extension = DOWNLOAD_KEYS[args.key]
+        watch_episode(args.input, args.output, download_key, extension, args.episode, args.segments, args.pipe, args.port, args.cache_ttl, args.browser_address)
+
+    elif args.action == 'enqueue':
+        download_key, extension = DOWNLOAD_KEYS[args.key]
+        enqueue_season(args.queue, args.input, args.output, download_key, extension, args.start_from, args.stop_at)
+
+    elif args.action == 'work':
+        # convert the speed limits from KB/s to bytes per second
+        rate_limit = args.rate_limit * 1000 if args.rate_limit else None
+        per_download_limit = args.per_download_limit * 1000 if args.per_download_limit else None
+
+        metrics.open(args.metrics, args.prometheus)
+        try:
+            run_worker(args.queue, args.max_downloads, args.segments, args.engine, rate_limit, per_download_limit, args.cache_ttl, args.browsers, args.browser_address, args.fsync, args.lease_time)
+
+        finally:
+            metrics.close()
+
+    elif args.action == 'batch':
+        metrics.open(args.metrics, args.prometheus)
+        try:
+            run_batch(args.input)
+
+        finally:
+            metrics.close()
 
     elif args.action == 'download':
-        match args.key:
-            case 'dub':
-                download_key = 'dubbed-audio'
-                extension = '.mp4'
-
-            case 'eng':
-                download_key = 'original-audio'
-                extension = '.mp4'
-            
-            case 'sub':
-                download_key = 'subtitles'
-                extension = '.srt'
+        download_key, extension = DOWNLOAD_KEYS[args.key]
+
+        # convert the speed limits from KB/s to bytes per second
+        rate_limit = args.rate_limit * 1000 if args.rate_limit else None
+        per_download_limit = args.per_download_limit * 1000 if args.per_download_limit else None
+
+        metrics.open(args.metrics, args.prometheus)
+        try:
+            download_all(args.input, args.output, download_key, extension, args.start_from, args.stop_at, args.max_downloads, args.segments, args.engine, rate_limit, per_download_limit, args.cache_ttl, args.browsers, args.look_ahead, args.browser_address, args.fsync)
 
-        download_all(args.input, args.output, download_key, extension, args.start_from, args.stop_at, args.max_downloads)
\ No newline at end of file
+        finally:
+            metrics.close()
\ No newline at end of file
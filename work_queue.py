@@ -0,0 +1,307 @@
+import threading
+import sqlite3
+import socket
+import time
+import json
+import os
+
+
+class WorkQueue():
+    """A persistent queue of tasks shared by worker processes on one or many machines, stored on a SQLite database.
+
+    Workers claim tasks under leases that expire after `lease_time` seconds, so the tasks of a worker that crashed
+    go back to the queue once its leases expire. While a worker holds a task, a background thread renews its lease.
+    A task can only be completed by the worker holding its lease, so every task is recorded as done exactly once.
+
+    The database can be on shared storage as long as the filesystem supports file locks, which isn't the case
+    for some network filesystems.
+
+    Attributes:
+    -----------
+    path : str
+        The path to the database file.
+
+    lease_time : float
+        The number of seconds a claimed task stays leased without being renewed.
+
+    max_attempts : int
+        The number of times a task is claimed before it's marked as failed.
+
+    worker_id : str
+        The name this worker records on the tasks it claims.
+    """
+
+    def __init__(self, path: str = "output/work_queue.db", lease_time: float = 300, max_attempts: int = 3, worker_id: str | None = None, on_lost=None):
+        """Initializes a WorkQueue instance, creating the database if it doesn't exist.
+
+        Parameters:
+        -----------
+        path : str, optional
+            The path to the database file (default is 'output/work_queue.db').
+
+        lease_time : float, optional
+            The number of seconds a claimed task stays leased without being renewed (default is 300).
+
+        max_attempts : int, optional
+            The number of times a task is claimed before it's marked as failed (default is 3).
+
+        worker_id : str | None, optional
+            The name this worker records on the tasks it claims (default is None, which uses the host name and
+            the process id).
+
+        on_lost : Callable[[str], None] | None, optional
+            Called from the heartbeat thread with the key of a task as soon as its lease can't be renewed, so the
+            work on it can be stopped before another worker claims it (default is None).
+        """
+
+        self.path = path
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._held = set()
+        self._lost = set()
+        self._on_lost = on_lost
+        self._heartbeat = None
+        self._closed = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # autocommit mode, so every transaction is started explicitly and the lock is only held while it runs
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    def _transaction(self, function):
+        # 'BEGIN IMMEDIATE' takes the write lock up front, so two workers can't read the same pending task
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(self._connection)
+
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+            self._connection.execute("COMMIT")
+            return result
+
+    def add(self, key: str, payload: dict):
+        """Adds a task, unless there's already one with the same key.
+
+        Parameters:
+        -----------
+        key : str
+            The unique key of the task.
+
+        payload : dict
+            The data needed to run the task. Must be serializable to json.
+
+        Returns:
+        --------
+        bool
+            True if the task was added.
+        """
+
+        def insert(connection: sqlite3.Connection):
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO tasks (key, payload, updated) VALUES (?, ?, ?)",
+                (key, json.dumps(payload), time.time())
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(insert)
+
+    def claim(self):
+        """Leases the oldest task that's pending or whose lease expired.
+
+        Returns:
+        --------
+        tuple[str, dict] | None
+            The key and the payload of the task, or None if there's nothing to claim right now.
+        """
+
+        def take(connection: sqlite3.Connection):
+            now = time.time()
+
+            # a task whose workers keep crashing is given up on like one that keeps failing
+            connection.execute(
+                "UPDATE tasks SET state = 'failed', updated = ? WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+
+            row = connection.execute(
+                "SELECT key, payload FROM tasks WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) ORDER BY rowid LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE key = ?",
+                (self.worker_id, now + self.lease_time, now, row[0])
+            )
+            return row[0], json.loads(row[1])
+
+        task = self._transaction(take)
+        if task is not None:
+            self._held.add(task[0])
+            self._start_heartbeat()
+
+        return task
+
+    def renew(self, key: str):
+        """Extends the lease of a task held by this worker.
+
+        Parameters:
+        -----------
+        key : str
+            The key of the task.
+
+        Returns:
+        --------
+        bool
+            False if the lease was lost, which means another worker may have claimed the task.
+        """
+
+        def extend(connection: sqlite3.Connection):
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE key = ? AND worker = ? AND state = 'leased'",
+                (time.time() + self.lease_time, time.time(), key, self.worker_id)
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(extend)
+
+    def complete(self, key: str):
+        """Records a task held by this worker as done.
+
+        Parameters:
+        -----------
+        key : str
+            The key of the task.
+
+        Returns:
+        --------
+        bool
+            True if this worker completed the task, or False if it had lost the lease.
+        """
+
+        def finish(connection: sqlite3.Connection):
+            cursor = connection.execute(
+                "UPDATE tasks SET state = 'done', lease_expires = NULL, updated = ? WHERE key = ? AND worker = ? AND state = 'leased'",
+                (time.time(), key, self.worker_id)
+            )
+            return cursor.rowcount == 1
+
+        self._held.discard(key)
+        return self._transaction(finish)
+
+    def release(self, key: str, failed: bool = False):
+        """Gives a task held by this worker back to the queue.
+
+        Parameters:
+        -----------
+        key : str
+            The key of the task.
+
+        failed : bool, optional
+            If True, the attempt counts as a failure and the task is marked as failed once it reaches
+            `max_attempts` (default is False).
+        """
+
+        def give_back(connection: sqlite3.Connection):
+            if failed:
+                connection.execute(
+                    "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, worker = NULL, lease_expires = NULL, updated = ? WHERE key = ? AND worker = ? AND state = 'leased'",
+                    (self.max_attempts, time.time(), key, self.worker_id)
+                )
+
+            # a task given back without failing, like when the worker stops, doesn't count as an attempt
+            else:
+                connection.execute(
+                    "UPDATE tasks SET state = 'pending', attempts = attempts - 1, worker = NULL, lease_expires = NULL, updated = ? WHERE key = ? AND worker = ? AND state = 'leased'",
+                    (time.time(), key, self.worker_id)
+                )
+
+        self._held.discard(key)
+        self._transaction(give_back)
+
+    def lost_leases(self):
+        """Gets the tasks whose lease this worker failed to renew since the last call.
+
+        Returns:
+        --------
+        set[str]
+            The keys of the tasks, which should be stopped since another worker may be running them.
+        """
+
+        with self._lock:
+            lost = self._lost
+            self._lost = set()
+            return lost
+
+    def counts(self):
+        """Counts the tasks on every state.
+
+        Returns:
+        --------
+        dict[str, int]
+            The number of tasks that are 'pending', 'leased', 'done' and 'failed'.
+        """
+
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        with self._lock:
+            for state, count in self._connection.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"):
+                counts[state] = count
+
+        return counts
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renew_held, daemon=True)
+                self._heartbeat.start()
+
+    def _renew_held(self):
+        # renew well before the leases expire, so a slow renewal doesn't lose them
+        while not self._closed.wait(self.lease_time / 3):
+            for key in list(self._held):
+                try:
+                    renewed = self.renew(key)
+
+                except sqlite3.Error:
+                    continue
+
+                if not renewed and key in self._held:
+                    self._held.discard(key)
+                    with self._lock:
+                        self._lost.add(key)
+
+                    if self._on_lost is not None:
+                        self._on_lost(key)
+
+    def close(self):
+        """Gives back every task this worker still holds, stops renewing leases and closes the database."""
+
+        self._closed.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+
+        for key in list(self._held):
+            self.release(key)
+
+        with self._lock:
+            self._connection.close()